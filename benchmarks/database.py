@@ -0,0 +1,158 @@
+import argparse
+import asyncio
+import logging
+import sys
+import time
+import tracemalloc
+
+from util.config import Config
+from util.database import Database
+from util.metrics import MetricsRegistry
+
+# Maximum round trips per operation, checked with --check
+BUDGETS = {
+    'guilds.get_data (cached)': 0,
+    'guilds.get_data (cold)': 1,
+    'guilds.set_value': 0.05,
+    'guilds.add_all': 0.01,
+    'stats.add_stats_request': 0.01,
+    'stats.set_guild_amount': 0.01,
+    'storage.get (cached)': 0,
+    'storage.get (cold)': 1,
+    'storage.set': 1,
+    'storage.get_many': 0.05,
+}
+
+
+class BenchmarkBot:
+
+    def __init__(self, guild_amount):
+        self.cfg = Config(values={
+            'Database.ConnectURI': 'memory://',
+            'Database.DatabaseName': 'benchmark',
+            'Database.FlushInterval': '3600',
+            'Database.CounterFlushInterval': '3600'
+        })
+        self.logger = logging.getLogger('benchmark')
+        self.metrics = MetricsRegistry()
+        self.guilds = [BenchmarkGuild(guild_id) for guild_id in range(1, guild_amount + 1)]
+        self.utils = BenchmarkUtils(self)
+
+
+class BenchmarkGuild:
+
+    def __init__(self, guild_id):
+        self.id = guild_id
+
+
+class BenchmarkUtils:
+
+    def __init__(self, bot):
+        self.bot_stats = self
+        self._bot = bot
+
+    def guilds(self):
+        return len(self._bot.guilds)
+
+
+class BenchmarkResult:
+
+    def __init__(self, name, operations, round_trips, seconds, allocated_bytes, allocated_blocks):
+        self.name = name
+        self.operations = operations
+        self.round_trips = round_trips / operations
+        self.latency = seconds / operations
+        self.allocated_bytes = allocated_bytes / operations
+        self.allocated_blocks = allocated_blocks / operations
+
+    def __str__(self):
+        return f'{self.name:<28} {self.operations:>7} {self.round_trips:>12.3f} {self.latency * 1e6:>12.1f} ' \
+               f'{self.allocated_bytes:>12.0f} {self.allocated_blocks:>10.1f}'
+
+
+async def measure(database, name, operations, function, flush=None, weight=None):
+    client = database._client
+    client.reset_round_trips()
+    tracemalloc.start()
+    snapshot = tracemalloc.take_snapshot()
+    start = time.perf_counter()
+    for index in range(operations):
+        await function(index)
+    if flush:
+        await flush()
+    seconds = time.perf_counter() - start
+    statistics = tracemalloc.take_snapshot().compare_to(snapshot, 'filename')
+    tracemalloc.stop()
+    allocated_bytes = sum(stat.size_diff for stat in statistics if stat.size_diff > 0)
+    allocated_blocks = sum(stat.count_diff for stat in statistics if stat.count_diff > 0)
+    # Batch operations are reported per item they process
+    return BenchmarkResult(name, weight or operations, client.total_round_trips, seconds, allocated_bytes,
+                           allocated_blocks)
+
+
+async def run(operations, guild_amount, latency):
+    bot = BenchmarkBot(guild_amount)
+    database = Database(bot)
+    await database.connect()
+    database._client.latency = latency
+    await database._setup_task
+
+    guilds = database.guilds
+    stats = database.stats
+    storage = database.storage
+    guild_ids = [guild.id for guild in bot.guilds]
+
+    results = list()
+    results.append(await measure(database, 'guilds.add_all', 1, lambda _: guilds.add_all(), weight=len(guild_ids)))
+    guilds.clear_cache()
+    results.append(await measure(database, 'guilds.get_data (cold)', min(operations, len(guild_ids)),
+                                 lambda index: guilds.get_data(guild_ids[index])))
+    results.append(await measure(database, 'guilds.get_data (cached)', operations,
+                                 lambda index: guilds.get_data(guild_ids[index % len(guild_ids)])))
+    results.append(await measure(database, 'guilds.set_value', operations,
+                                 lambda index: guilds.set_value(guild_ids[index % len(guild_ids)], 'lang', str(index)),
+                                 flush=guilds.flush))
+    results.append(await measure(database, 'stats.add_stats_request', operations,
+                                 lambda _: stats.add_stats_request(), flush=stats.flush))
+    results.append(await measure(database, 'stats.set_guild_amount', operations,
+                                 lambda _: stats.set_guild_amount(), flush=stats.flush))
+    results.append(await measure(database, 'storage.set', operations,
+                                 lambda index: storage.set(f'benchmark.{index}', index)))
+    storage._cache.clear()
+    results.append(await measure(database, 'storage.get (cold)', operations,
+                                 lambda index: storage.get(f'benchmark.{index}')))
+    results.append(await measure(database, 'storage.get (cached)', operations,
+                                 lambda index: storage.get(f'benchmark.{index}')))
+    storage._cache.clear()
+    paths = [f'benchmark.{index}' for index in range(operations)]
+    results.append(await measure(database, 'storage.get_many', len(paths[::50]),
+                                 lambda index: storage.get_many(paths[index * 50:index * 50 + 50]), weight=len(paths)))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Round trips, latency and allocations per database operation.')
+    parser.add_argument('--operations', type=int, default=1000)
+    parser.add_argument('--guilds', type=int, default=1000)
+    parser.add_argument('--latency', type=float, default=0.0, help='simulated round trip latency in seconds')
+    parser.add_argument('--check', action='store_true', help='fail if an operation exceeds its round trip budget')
+    args = parser.parse_args()
+
+    results = asyncio.get_event_loop().run_until_complete(run(args.operations, args.guilds, args.latency))
+
+    print(f'{"operation":<28} {"ops":>7} {"round trips":>12} {"latency us":>12} {"alloc B":>12} {"blocks":>10}')
+    failed = list()
+    for result in results:
+        print(result)
+        if result.round_trips > BUDGETS.get(result.name, float('inf')):
+            failed.append(result)
+
+    if args.check and failed:
+        for result in failed:
+            print(f'{result.name} exceeded its budget: {result.round_trips:.3f} > {BUDGETS[result.name]} round trips',
+                  file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+import asyncio
+import itertools
+import logging
+import time
+from collections import Counter
+
+from util.config import Config
+from util.metrics import MetricsRegistry
+
+snowflakes = itertools.count(1)
+
+
+class SimulatedREST:
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.requests = Counter()  # route -> requests
+
+    async def request(self, route):
+        self.requests[route] += 1
+        # Always yield like a real request would, even without latency
+        await asyncio.sleep(self.latency)
+
+    @property
+    def total_requests(self):
+        return sum(self.requests.values())
+
+
+class SimulatedObject:
+
+    def __init__(self, object_id=None):
+        self.id = object_id or next(snowflakes)
+
+    def __eq__(self, other):
+        return isinstance(other, SimulatedObject) and other.id == self.id
+
+    def __hash__(self):
+        return hash(self.id)
+
+
+class SimulatedUser(SimulatedObject):
+
+    bot = False
+
+    def __str__(self):
+        return f'User#{self.id}'
+
+
+class SimulatedGuild(SimulatedObject):
+    pass
+
+
+class SimulatedChannel(SimulatedObject):
+
+    def __init__(self, gateway, guild=None):
+        super().__init__()
+        self.gateway = gateway
+        self.guild = guild
+        self.last_message = None
+
+    async def send(self, content=None, embed=None):
+        await self.gateway.rest.request('send')
+        self.last_message = SimulatedMessage(self.gateway, self, self.gateway.bot.user, content, embed)
+        return self.last_message
+
+
+class SimulatedMessage(SimulatedObject):
+
+    def __init__(self, gateway, channel, author, content=None, embed=None):
+        super().__init__()
+        self.gateway = gateway
+        self.channel = channel
+        self.guild = channel.guild
+        self.author = author
+        self.content = content
+        self.embed = embed
+        self.reactions = list()
+        self.edits = 0
+        self.edited = asyncio.Event()
+
+    async def edit(self, content=None, embed=None):
+        await self.gateway.rest.request('edit')
+        self.content = content if content is not None else self.content
+        self.embed = embed if embed is not None else self.embed
+        self.edits += 1
+        self.gateway.on_edited(self)
+        self.edited.set()
+
+    async def add_reaction(self, emoji):
+        await self.gateway.rest.request('add_reaction')
+        self.reactions.append(emoji)
+
+    async def clear_reactions(self):
+        await self.gateway.rest.request('clear_reactions')
+        self.reactions.clear()
+
+    async def clear_reaction(self, emoji):
+        await self.gateway.rest.request('clear_reaction')
+        if emoji in self.reactions:
+            self.reactions.remove(emoji)
+
+    async def remove_reaction(self, emoji, member):
+        await self.gateway.rest.request('remove_reaction')
+
+    async def delete(self):
+        await self.gateway.rest.request('delete')
+        self.gateway.message_delete(self)
+
+
+class SimulatedReaction:
+
+    def __init__(self, emoji, message):
+        self.emoji = emoji
+        self.message = message
+
+
+class SimulatedPayload:
+
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+class SimulatedContext:
+
+    def __init__(self, bot, author, channel):
+        self.bot = bot
+        self.author = author
+        self.channel = channel
+        self.guild = channel.guild
+
+
+class SimulatedBot:
+
+    def __init__(self, config=None):
+        self.cfg = Config(values=config or dict())
+        self.logger = logging.getLogger('benchmark')
+        self.metrics = MetricsRegistry()
+        self.loop = asyncio.get_event_loop()
+        self.user = SimulatedUser()
+        self._listeners = dict()  # event -> [coroutine function]
+
+    def add_listener(self, function, name):
+        self._listeners.setdefault(name, list()).append(function)
+
+    def dispatch(self, event, *args):
+        # discord.py runs every listener as its own task
+        for listener in self._listeners.get(f'on_{event}', list()):
+            self.loop.create_task(listener(*args))
+
+
+class SimulatedGateway:
+
+    def __init__(self, bot, latency=0.0, rate=0.0):
+        self.bot = bot
+        self.rest = SimulatedREST(latency)
+        self.rate = rate
+        self.dispatched = 0
+        self.latencies = list()  # seconds between an event and the edit it caused
+        self._emitted = dict()  # message_id -> time of the last event targeting the message
+        self._next_event = None
+
+    def channel(self, guild=None):
+        return SimulatedChannel(self, guild)
+
+    def on_edited(self, message):
+        emitted = self._emitted.pop(message.id, None)
+        if emitted is not None:
+            self.latencies.append(time.perf_counter() - emitted)
+
+    async def pace(self):
+        # Spreads the events of all clients evenly at `rate` events per second, 0 is unlimited
+        if not self.rate:
+            return
+        now = time.perf_counter()
+        scheduled = max(self._next_event or now, now)
+        self._next_event = scheduled + 1 / self.rate
+        await asyncio.sleep(scheduled - now)
+
+    def message(self, channel, author, content, target=None):
+        message = SimulatedMessage(self, channel, author, content)
+        self._emit(target)
+        self.bot.dispatch('message', message)
+        return message
+
+    def reaction_add(self, message, user, emoji):
+        self._emit(message)
+        self.bot.dispatch('reaction_add', SimulatedReaction(emoji, message), user)
+        self.bot.dispatch('raw_reaction_add', SimulatedPayload(channel_id=message.channel.id, message_id=message.id,
+                                                               user_id=user.id, emoji=emoji))
+
+    def reaction_remove(self, message, user, emoji):
+        self.dispatched += 1
+        self.bot.dispatch('raw_reaction_remove', SimulatedPayload(channel_id=message.channel.id,
+                                                                  message_id=message.id, user_id=user.id, emoji=emoji))
+
+    def message_delete(self, message):
+        self.dispatched += 1
+        self.bot.dispatch('raw_message_delete', SimulatedPayload(channel_id=message.channel.id,
+                                                                 message_id=message.id))
+
+    def _emit(self, target):
+        self.dispatched += 1
+        if target is not None:
+            target.edited.clear()
+            self._emitted[target.id] = time.perf_counter()
@@ -0,0 +1,116 @@
+import argparse
+import asyncio
+import time
+import tracemalloc
+
+from benchmarks.gateway import SimulatedBot, SimulatedContext, SimulatedGateway, SimulatedGuild, SimulatedUser
+from util.selection import ReplacedText, SelectionFlow, SelectionType
+
+SESSIONS_PER_GUILD = 25
+
+
+def build_flow():
+    flow = SelectionFlow(timeout=300)
+    title_selection = flow.set_base_selection(SelectionType.TEXT, 'Select Title', '**Please enter a title.**')
+    option_selection = title_selection.add_result('*', SelectionType.REACTION, 'Select Option',
+                                                  ReplacedText('Title **{}** set!', lambda result: result[0]),
+                                                  reactions=['\U00000031\U000020e3', '\U00000032\U000020e3'])
+    confirm_selection = option_selection.add_result('*', SelectionType.CONFIRM_SELECTION,
+                                                    ReplacedText('{}', lambda result: result[0]),
+                                                    ReplacedText('Option {}', lambda result: result[1]))
+    confirm_selection.add_result('*', SelectionType.SUCCESS, 'Done', 'Selection finished!')
+    return flow.freeze()
+
+
+class SelectionBenchmarkResult:
+
+    def __init__(self, sessions, events, seconds, latencies, session_bytes, requests, lost):
+        self.sessions = sessions
+        self.events = events
+        self.events_per_second = events / seconds if seconds else 0.0
+        latencies = sorted(latencies)
+        self.latencies = {
+            quantile: latencies[min(len(latencies) - 1, int(quantile * len(latencies)))] if latencies else 0.0
+            for quantile in (0.5, 0.95, 0.99)
+        }
+        self.session_bytes = session_bytes
+        self.requests = requests / sessions
+        self.lost = lost
+
+    def __str__(self):
+        return f'{self.sessions:>8} {self.events:>7} {self.events_per_second:>10.0f} ' \
+               f'{self.latencies[0.5] * 1000:>9.2f} {self.latencies[0.95] * 1000:>9.2f} ' \
+               f'{self.latencies[0.99] * 1000:>9.2f} {self.session_bytes / 1024:>10.1f} {self.requests:>9.1f} ' \
+               f'{self.lost:>5}'
+
+
+async def drive(gateway, context, message, timeout):
+    # Walks one session through the flow like a member would: title, option, confirm
+    events = [
+        lambda: gateway.message(context.channel, context.author, f'Title {context.author.id}', target=message),
+        lambda: gateway.reaction_add(message, context.author, '\U00000031\U000020e3'),
+        lambda: gateway.reaction_add(message, context.author, '\U00002705')
+    ]
+    for event in events:
+        await gateway.pace()
+        event()
+        try:
+            await asyncio.wait_for(message.edited.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+    return True
+
+
+async def run(sessions, latency, rate, timeout):
+    bot = SimulatedBot({
+        'Selection.MaxUserSessions': '1',
+        'Selection.MaxGuildSessions': str(SESSIONS_PER_GUILD)
+    })
+    gateway = SimulatedGateway(bot, latency, rate)
+    flow = build_flow()
+    guilds = [SimulatedGuild() for _ in range(max(1, -(-sessions // SESSIONS_PER_GUILD)))]
+    contexts = [SimulatedContext(bot, SimulatedUser(), gateway.channel(guilds[index // SESSIONS_PER_GUILD]))
+                for index in range(sessions)]
+
+    # Memory is measured while every session waits on its first step
+    tracemalloc.start()
+    snapshot = tracemalloc.take_snapshot()
+    tasks = [bot.loop.create_task(flow.start(context)) for context in contexts]
+    while any(context.channel.last_message is None for context in contexts):
+        await asyncio.sleep(0.01)
+    await asyncio.sleep(max(0.05, latency * 4))
+    statistics = tracemalloc.take_snapshot().compare_to(snapshot, 'filename')
+    tracemalloc.stop()
+    session_bytes = sum(stat.size_diff for stat in statistics if stat.size_diff > 0) / sessions
+
+    start = time.perf_counter()
+    dispatched = gateway.dispatched
+    finished = await asyncio.gather(*[drive(gateway, context, context.channel.last_message, timeout)
+                                      for context in contexts])
+    seconds = time.perf_counter() - start
+    events = gateway.dispatched - dispatched
+
+    await asyncio.wait(tasks, timeout=timeout)
+    for task in tasks:
+        task.cancel()
+    return SelectionBenchmarkResult(sessions, events, seconds, gateway.latencies, session_bytes,
+                                    gateway.rest.total_requests, finished.count(False))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Event throughput, dispatch latency and memory of selection sessions.')
+    parser.add_argument('--sessions', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--latency', type=float, default=0.0, help='simulated REST latency in seconds')
+    parser.add_argument('--rate', type=float, default=0.0, help='gateway events per second, 0 is unlimited')
+    parser.add_argument('--timeout', type=float, default=10.0, help='seconds to wait for the reaction to an event')
+    args = parser.parse_args()
+
+    print(f'{"sessions":>8} {"events":>7} {"events/s":>10} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9} '
+          f'{"KiB/sess":>10} {"req/sess":>9} {"lost":>5}')
+    loop = asyncio.get_event_loop()
+    for sessions in args.sessions:
+        print(loop.run_until_complete(run(sessions, args.latency, args.rate, args.timeout)))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,6 @@
 import asyncio
-import logging
-import time
-
+import importlib
+import signal
 import sys
 import traceback
 
@@ -10,22 +9,85 @@ from discord.ext import commands
 
 from util.config import Config
 from util.context import Context
-from util.database import Database
+from util.logger import LogPipeline
+from util.metrics import MetricsExporter, MetricsRegistry
+from util.startup import StartupProfiler, preload_module, process_started
+from util.telemetry import CommandTelemetry
 from util.utils import Utils
+from util.watchdog import LoopWatchdog
 
-start_time = time.time()
+started = process_started()
+startup = StartupProfiler(started)
+if started is not None:
+    startup.record('interpreter and imports', started)
 
 
 class FortniteApiSupport(commands.Bot):
 
-    def __init__(self, *args, **kwargs):
-        self.logger = set_logger()
-        self.cfg = Config(False)
-
-        super().__init__(*args, command_prefix=get_prefix, **kwargs, owner_id=int(self.cfg.get('Core.OwnerID')))
-
-        self.db = Database(self)
-        self.utils = Utils(self)
+    def __init__(self, *args, startup=None, **kwargs):
+        self.startup = startup or StartupProfiler()
+        with self.startup.phase('config'):
+            self.cfg = Config(False)
+        with self.startup.phase('logger'):
+            self.log_pipeline = LogPipeline('-NoFileLog' not in sys.argv, self.cfg.logging.directory,
+                                            self.cfg.logging.max_bytes, self.cfg.logging.rotate_interval)
+            self.logger = self.log_pipeline.logger
+
+        super().__init__(*args, command_prefix=get_prefix, **kwargs, owner_id=self.cfg.core.owner_id)
+
+        with self.startup.phase('services'):
+            self.metrics = MetricsRegistry()
+            self.telemetry = CommandTelemetry(self)
+            self.metrics_exporter = MetricsExporter(self.metrics, self.cfg.telemetry.export_file,
+                                                    self.cfg.telemetry.export_host, self.cfg.telemetry.export_port,
+                                                    self.cfg.telemetry.export_interval)
+            self.watchdog = LoopWatchdog(self)
+            self.db = None  # set by connect_database, util.database imports pymongo
+            self.utils = Utils(self)
+        self._database_created = asyncio.Event()
+
+        self.loop.create_task(self.cfg.watch(self.logger))
+        self.loop.create_task(self.metrics_exporter.start())
+        self.loop.create_task(self.watchdog.run())
+
+    async def connect_database(self):
+        # pymongo and motor are the heaviest imports, they load in the executor while the bot logs in
+        module = await self.loop.run_in_executor(None, importlib.import_module, 'util.database')
+        self.db = module.Database(self)
+        self._database_created.set()
+        await self.db.connect()
+        self.loop.create_task(self.startup.measure('database ready', self.db.wait_until_ready()))
+
+    async def load_initial_cogs(self):
+        extensions = self.cfg.core.initial_cogs
+        # The imports of all cogs run concurrently in the executor
+        preloads = [self.startup.measure(f'cog {extension} imports',
+                                         self.loop.run_in_executor(None, preload_module, f'cogs.{extension}'))
+                    for extension in extensions]
+        await asyncio.gather(*preloads)
+        # Running the cog modules and their setup needs the loop, cogs may use the database in their setup
+        await self._database_created.wait()
+        for extension in extensions:
+            with self.startup.phase(f'cog {extension}'):
+                try:
+                    self.load_extension(f'cogs.{extension}')
+                except Exception:
+                    self.logger.exception(f'Failed to load extension {extension}.')
+                    traceback.print_exc()
+
+    async def close(self):
+        try:
+            if self.db is not None:
+                await self.db.close()
+        except Exception:
+            self.logger.exception('[DATABASE] Failed to flush pending writes on shutdown!')
+        try:
+            await self.utils.reporter.flush()
+        except Exception:
+            self.logger.exception('[ERROR] Failed to send the pending exception summary on shutdown!')
+        await self.metrics_exporter.stop()
+        self.watchdog.stop()
+        await super().close()
 
 
 async def get_prefix(bot, message: discord.Message):
@@ -33,25 +95,18 @@ async def get_prefix(bot, message: discord.Message):
 
 
 def init(bot_class=FortniteApiSupport):
-    client = bot_class(description='Fortnite API Support Bot', case_insensitive=True)
+    client = bot_class(description='Fortnite API Support Bot', case_insensitive=True, startup=startup)
     client.remove_command("help")
 
-    extensions = client.cfg.get('Core.InitialCogs').split(', ')
-
-    for extension in extensions:
-        try:
-            client.load_extension(f'cogs.{extension}')
-        except Exception:
-            client.logger.exception(f'Failed to load extension {extension}.')
-            traceback.print_exc()
-
     @client.event
     async def on_ready():
-        global start_time
-        if start_time == 0.0:
+        if client.startup.stop('gateway') is None:
             return
-        bot.logger.info(f'[CORE] The bot was started successfully after {int(time.time() - start_time)} seconds.')
-        start_time = 0.0
+        with client.startup.phase('ready'):
+            await client.db.wait_until_ready()
+            await client.db.guilds.warm_up(guild.id for guild in client.guilds)
+        client.startup.finish(client.metrics)
+        client.logger.info(client.startup.report())
 
     @client.event
     async def on_command_error(ctx: Context, error):
@@ -68,11 +123,7 @@ def init(bot_class=FortniteApiSupport):
 
     @client.event
     async def on_error(event, *args, **kwargs):
-        await bot.utils.report_exception(traceback.format_exc())
-
-    @client.event
-    async def on_command(ctx: Context):
-        client.logger.info(f'[CORE] {ctx.author} on {ctx.guild.name}: {ctx.message.content}')
+        await client.utils.report_exception(traceback.format_exc())
 
     @client.event
     async def on_message(message: discord.Message):
@@ -93,53 +144,13 @@ def init(bot_class=FortniteApiSupport):
     return client
 
 
-def set_logger():
-    import datetime
-    import gzip
-    import os
-    import shutil
-    logger = logging.getLogger('bot')
-    logger.setLevel(logging.DEBUG)
-    discord_logger = logging.getLogger('discord')
-    discord_logger.setLevel(logging.INFO)
-    log_formatter = logging.Formatter('%(asctime)s:%(levelname)s:%(name)s: %(message)s')
-
-    console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setLevel(logging.DEBUG)
-    console_handler.setFormatter(log_formatter)
-    logger.addHandler(console_handler)
-    discord_logger.addHandler(console_handler)
-
-    if sys.argv.__contains__('-NoFileLog'):
-        return logger
-
-    if not os.path.exists('logs'):
-        os.makedirs('logs')
-    if os.path.isfile('logs//latest.log'):
-        filename = None
-        index = 1
-        date = datetime.datetime.now().strftime('%Y-%m-%d')
-        while filename is None:
-            check_filename = f'{date}-{index}.log.gz'
-            if os.path.isfile(f'logs//{check_filename}'):
-                index += 1
-            else:
-                filename = check_filename
-        with open('logs//latest.log', 'rb') as f_in, gzip.open(f'logs//{filename}', 'wb') as f_out:
-            shutil.copyfileobj(f_in, f_out)
-        os.remove('logs//latest.log')
-
-    file_handler = logging.FileHandler(filename='logs//latest.log', encoding='utf-8', mode='w')
-    file_handler.setLevel(logging.DEBUG)
-    file_handler.setFormatter(log_formatter)
-    logger.addHandler(file_handler)
-    discord_logger.addHandler(file_handler)
-
-    return logger
-
-
 async def main(efs_bot):
-    await efs_bot.login(efs_bot.cfg.get('Core.Token'))
+    startup = efs_bot.startup
+    # The cog and database imports run in the executor while the login request is in flight
+    await asyncio.gather(startup.measure('login', efs_bot.login(efs_bot.cfg.core.token)),
+                         startup.measure('database connect', efs_bot.connect_database()),
+                         efs_bot.load_initial_cogs())
+    startup.start('gateway')
     await efs_bot.connect()
 
 
@@ -147,8 +158,19 @@ if __name__ == '__main__':
     bot = init()
     loop = asyncio.get_event_loop()
 
+    # login() and connect() install no signal handlers, without a close the buffered writes would be lost
+    shutdown = list()
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signal_number, lambda: shutdown or shutdown.append(loop.create_task(bot.close())))
+        except NotImplementedError:
+            # Not supported on Windows, Ctrl+C still raises a KeyboardInterrupt there
+            pass
+
     try:
         loop.run_until_complete(main(bot))
+    except KeyboardInterrupt:
+        loop.run_until_complete(bot.close())
     except discord.LoginFailure:
         bot.logger.exception(traceback.format_exc())
     except Exception as e:
@@ -156,5 +178,8 @@ if __name__ == '__main__':
                              exc_info=e)
         loop.run_until_complete(bot.logout())
     finally:
+        if shutdown:
+            loop.run_until_complete(asyncio.gather(*shutdown))
         loop.close()
+        bot.log_pipeline.stop()
         exit(0)
@@ -6,19 +6,21 @@ from discord.ext import commands
 
 from util import checks
 from util.context import Context
-from util.selection import SelectionInterface, SelectionType, ReplacedText
+from util.selection import SelectionFlow, SelectionType, ReplacedText
 
 
 class AdminCommands(commands.Cog):
 
-    @commands.command(case_insensitive=True)
-    @commands.guild_only()
-    @checks.is_admin()
-    async def update(self, ctx: Context):
-        selection = SelectionInterface(ctx, timeout=300)
+    def __init__(self, bot):
+        self.bot = bot
+        self.update_flow = self._build_update_flow()
 
-        title_selection = selection.set_base_selection(SelectionType.TEXT, 'Select Title',
-                                                       '**Please enter the update title.**')
+    @staticmethod
+    def _build_update_flow():
+        flow = SelectionFlow(timeout=300)
+
+        title_selection = flow.set_base_selection(SelectionType.TEXT, 'Select Title',
+                                                  '**Please enter the update title.**')
 
         message_selection = title_selection.add_result('*', SelectionType.TEXT, 'Select Message',
                                                        'Title successfully set!\n\n'
@@ -62,21 +64,56 @@ class AdminCommands(commands.Cog):
             update_message.description = f'▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬\n\n{result[1]}'
             update_message.set_footer(text='Subscribe to Updates in #info by clicking on the reaction.')
 
-            update_role = context.utils.role.notification()
+            news_channel = await context.utils.channel.news()
+            if news_channel is None:
+                raise commands.CommandError('The news channel is not available.')
+            if result[3] != '🔔':
+                await news_channel.send(embed=update_message)
+                return
+
+            # The role has to be from the guild of the news channel, the command may run in another one
+            update_role = await context.utils.role.notification(news_channel.guild)
+            if update_role is None:
+                raise commands.CommandError('The notification role is not available.')
             await update_role.edit(mentionable=True, reason='Update mention')
-
-            await context.utils.channel.news().send(
-                content=update_role.mention if selection.result()[3] == '🔔' else None,
-                embed=update_message)
-
-            await update_role.edit(mentionable=False, reason='Update mention')
+            try:
+                await news_channel.send(content=update_role.mention, embed=update_message)
+            finally:
+                await update_role.edit(mentionable=False, reason='Update mention')
 
         submit_selection.set_action(a)
 
         submit_selection.add_result('*', SelectionType.SUCCESS, 'Update successfully',
                                     ':white_check_mark: Update successfully sent!')
 
-        await selection.start()
+        return flow.freeze()
+
+    @commands.command(case_insensitive=True)
+    @commands.guild_only()
+    @checks.is_admin()
+    async def update(self, ctx: Context):
+        await self.update_flow.start(ctx)
+
+    @commands.command(case_insensitive=True)
+    @commands.is_owner()
+    async def lag(self, ctx: Context):
+        watchdog = self.bot.watchdog
+        lag = self.bot.metrics.histogram('event_loop_lag_seconds')
+
+        lag_message = discord.Embed()
+        lag_message.colour = discord.Color.dark_teal()
+        lag_message.set_author(name='Event Loop Lag')
+        lag_message.description = f'**p50:** {lag.quantile(0.5) * 1000:.0f}ms ' \
+                                  f'**p99:** {lag.quantile(0.99) * 1000:.0f}ms ' \
+                                  f'**Mean:** {lag.mean * 1000:.1f}ms\n' \
+                                  f'**Stalls:** {self.bot.metrics.counter("event_loop_stalls_total").value}'
+        for offender in watchdog.report(10):
+            lag_message.add_field(name=offender.coroutine[:256], inline=False,
+                                  value=f'`{offender.location}`\n{offender.count}x, {offender.total:.2f}s total, '
+                                        f'{offender.max:.2f}s max')
+        if not watchdog.offenders:
+            lag_message.add_field(name='Offenders', value='The event loop was not blocked yet.')
+        await ctx.send(embed=lag_message)
 
     @commands.command(case_insensitive=True)
     @commands.guild_only()
@@ -0,0 +1,53 @@
+import importlib
+
+
+def motor_backend(uri: str, **kwargs):
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    return AsyncIOMotorClient(uri, **kwargs)
+
+
+def memory_backend(uri: str, latency=0.0, **kwargs):
+    from util.memory import MemoryClient
+
+    # Command and pool listeners only apply to a real server
+    return MemoryClient(latency=latency)
+
+
+# A backend is a factory returning a client with the subset of the motor API the managers use:
+# client[name] -> database, database[name] -> collection, database.list_collection_names() and
+# database.command('ping'). util.memory.MemoryCollection lists the collection methods.
+backends = {
+    'mongodb': motor_backend,
+    'mongodb+srv': motor_backend,
+    'memory': memory_backend
+}
+
+# Modules a backend imports when its client is created, see preload_backend
+backend_modules = {
+    'mongodb': ('motor.motor_asyncio',),
+    'mongodb+srv': ('motor.motor_asyncio',),
+    'memory': ('util.memory',)
+}
+
+
+def register_backend(scheme: str, factory, modules=()):
+    backends[scheme] = factory
+    backend_modules[scheme] = tuple(modules)
+
+
+def backend_scheme(uri: str):
+    return uri.split('://', 1)[0] if '://' in uri else 'mongodb'
+
+
+def preload_backend(uri: str):
+    # Meant to run in an executor, importing motor takes a good part of the startup otherwise
+    for module in backend_modules.get(backend_scheme(uri), ()):
+        importlib.import_module(module)
+
+
+def create_client(uri: str, **kwargs):
+    scheme = backend_scheme(uri)
+    if scheme not in backends:
+        raise ValueError(f'No database backend registered for {scheme}://')
+    return backends[scheme](uri, **kwargs)
@@ -0,0 +1,101 @@
+import sys
+import time
+from collections import OrderedDict
+
+
+def estimate_size(value):
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        for key, item in value.items():
+            size += estimate_size(key) + estimate_size(item)
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        for item in value:
+            size += estimate_size(item)
+    return size
+
+
+class LRUCache:
+
+    def __init__(self, max_size=1024, ttl=None, max_bytes=None, sizeof=estimate_size):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof
+
+        self._entries = OrderedDict()  # key -> (expires_at, size, value)
+        self._bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return self.get(key, MISSING) is not MISSING
+
+    @property
+    def size_bytes(self):
+        return self._bytes
+
+    def get(self, key, default=None):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        expires_at, _, value = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            self._remove(key)
+            self.misses += 1
+            return default
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value):
+        if key in self._entries:
+            self._remove(key)
+        size = self._sizeof(value) if self.max_bytes else 0
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        self._entries[key] = (expires_at, size, value)
+        self._bytes += size
+        self._evict()
+
+    def pop(self, key, default=None):
+        if key not in self._entries:
+            return default
+        return self._remove(key)
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    def keys(self):
+        return list(self._entries.keys())
+
+    def resize(self, max_size, ttl=None, max_bytes=None):
+        # A new TTL only applies to entries set afterwards
+        if max_bytes and not self.max_bytes:
+            self._entries = OrderedDict((key, (expires_at, self._sizeof(value), value))
+                                        for key, (expires_at, _, value) in self._entries.items())
+            self._bytes = sum(size for _, size, _ in self._entries.values())
+        self.max_size = max_size
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._evict()
+
+    def _remove(self, key):
+        _, size, value = self._entries.pop(key)
+        self._bytes -= size
+        return value
+
+    def _evict(self):
+        while self._entries and (len(self._entries) > self.max_size or
+                                 (self.max_bytes and self._bytes > self.max_bytes)):
+            key = next(iter(self._entries))
+            self._remove(key)
+            self.evictions += 1
+
+
+MISSING = object()
@@ -1,31 +1,235 @@
-from configparser import ConfigParser
+import asyncio
+import os
+import re
+from configparser import ConfigParser, Error
+
+
+class ConfigError(ValueError):
+    pass
+
+
+def boolean(value: str):
+    if value.lower() in ('true', 'yes', 'on', '1'):
+        return True
+    if value.lower() in ('false', 'no', 'off', '0'):
+        return False
+    raise ValueError('expected true or false')
+
+
+def positive_int(value: str):
+    value = int(value)
+    if value < 1:
+        raise ValueError('expected a number of at least 1')
+    return value
+
+
+def string_list(value: str):
+    return tuple(item.strip() for item in value.split(',') if item.strip())
+
+
+def id_list(value: str):
+    return tuple(int(item) for item in string_list(value))
+
+
+class Option:
+
+    __slots__ = ('cast', 'default')
+
+    def __init__(self, cast=str, default=None):
+        self.cast = cast
+        self.default = default
+
+
+# Options are parsed and validated once per load, options missing in the file get their default
+SCHEMA = {
+    'Core': {
+        'Token': Option(),
+        'OwnerID': Option(int),
+        'InitialCogs': Option(string_list, ()),
+        'ConfigReloadInterval': Option(float, 5.0)
+    },
+    'Channel': {
+        'News': Option(int),
+        'Errors': Option(int)
+    },
+    'Role': {
+        'Notification': Option(int)
+    },
+    'Database': {
+        'ConnectURI': Option(),
+        'DatabaseName': Option(),
+        'SlowQueryThreshold': Option(float, 0.1),
+        'WatchStorage': Option(boolean, False),
+        'FlushInterval': Option(float, 5.0),
+        'CounterFlushInterval': Option(float, 10.0),
+        'BulkChunkSize': Option(int, 1000),
+        'MigrationBatchSize': Option(int, 500),
+        'GuildCacheSize': Option(int, 10000),
+        'GuildCacheTTL': Option(int, 3600),
+        'GuildCacheBytes': Option(int, 32 * 1024 * 1024),
+        'StorageCacheSize': Option(int, 4096),
+        'StorageCacheTTL': Option(int, 300),
+        'SnapshotDirectory': Option(str, 'backups'),
+        'SnapshotBatchSize': Option(int, 1000)
+    },
+    'Logging': {
+        'Directory': Option(str, 'logs'),
+        'MaxBytes': Option(int, 16 * 1024 * 1024),
+        'RotateInterval': Option(int, 24 * 60 * 60)
+    },
+    'Telemetry': {
+        'LogSampleRate': Option(float, 1.0),
+        'SlowCommandThreshold': Option(float, 1.0),
+        'UserRateWarning': Option(int, 30),
+        'TopCallers': Option(int, 10),
+        'ExportFile': Option(),
+        'ExportHost': Option(str, '127.0.0.1'),
+        'ExportPort': Option(int),
+        'ExportInterval': Option(float, 15.0)
+    },
+    'Watchdog': {
+        'Enabled': Option(boolean, True),
+        'Interval': Option(float, 0.1),
+        'Threshold': Option(float, 0.25),
+        'MaxOffenders': Option(int, 50)
+    },
+    'Reporting': {
+        'Window': Option(float, 30.0),
+        'MaxPending': Option(int, 100),
+        'MaxFields': Option(int, 10)
+    },
+    'Selection': {
+        'MaxUserSessions': Option(positive_int, 2),
+        'MaxGuildSessions': Option(positive_int, 50),
+        'EditRate': Option(int, 5),
+        'EditPer': Option(float, 5.0)
+    }
+}
+
+
+def attribute_name(name: str):
+    # GuildCacheTTL -> guild_cache_ttl, OwnerID -> owner_id
+    return re.sub(r'(?<=[a-z0-9])(?=[A-Z])|(?<=[A-Z])(?=[A-Z][a-z])', '_', name).lower()
+
+
+class ConfigSection:
+
+    def __init__(self, values):
+        self.__dict__.update(values)
 
 
 class Config:
 
-    def __init__(self, test=False):
-        self._test = test
-        self._config = ConfigParser()
+    def __init__(self, test=False, values=None):
+        self._path = 'config/test_config.ini' if test else 'config/config.ini'
+        self._values = values  # section.option -> raw value, replaces the file if set
         self._loaded_config = dict()
+        self._subscribers = list()  # (paths or None, callback(changes))
+        self._modified = None
+        self._sections = dict()  # section name -> ConfigSection
 
         self.load()
 
+    def __getattr__(self, name):
+        # Only reached for names the Config itself does not have, so a section can never shadow a method
+        sections = self.__dict__.get('_sections', dict())
+        if name in sections:
+            return sections[name]
+        raise AttributeError(f'Config has no section or attribute {name}')
+
+    def section(self, name: str):
+        return self._sections.get(name.lower())
+
+    def _read(self):
+        if self._values is not None:
+            return {path.lower(): str(value) for path, value in self._values.items()}
+        config = ConfigParser()
+        try:
+            config.read(self._path, encoding='utf-8')
+        except Error as ex:
+            raise ConfigError(f'Failed to parse {self._path}: {ex}')
+        return {f'{section.lower()}.{option.lower()}': config.get(section, option)
+                for section in config.sections() for option in config.options(section)}
+
+    @staticmethod
+    def _parse(raw):
+        loaded_config = dict()
+        sections = dict()
+        for section, options in SCHEMA.items():
+            values = sections.setdefault(section.lower(), dict())
+            for name, option in options.items():
+                path = f'{section}.{name}'.lower()
+                value = option.default
+                if path in raw:
+                    try:
+                        value = option.cast(raw[path])
+                    except (TypeError, ValueError) as ex:
+                        raise ConfigError(f'Invalid value for {section}.{name}: {ex}')
+                loaded_config[path] = value
+                values[attribute_name(name)] = value
+        # Options unknown to the schema stay available as strings
+        for path, value in raw.items():
+            if path in loaded_config:
+                continue
+            section, option = path.split('.', 1)
+            loaded_config[path] = value
+            sections.setdefault(section, dict())[option] = value
+        return loaded_config, {section: ConfigSection(values) for section, values in sections.items()}
+
+    def _last_modified(self):
+        if self._values is not None:
+            return None
+        try:
+            return os.stat(self._path).st_mtime_ns
+        except OSError:
+            return None
+
     def load(self):
+        self._modified = self._last_modified()
+        loaded_config, sections = self._parse(self._read())
+
+        changes = dict()  # path -> (old, new)
+        for path in set(self._loaded_config) | set(loaded_config):
+            old, new = self._loaded_config.get(path), loaded_config.get(path)
+            if old != new:
+                changes[path] = (old, new)
+
+        # Nothing is swapped before the whole file parsed, an invalid file keeps the previous config
+        self._loaded_config = loaded_config
+        # Replaced as a whole, sections removed from the file disappear on reload
+        self._sections = sections
+        return changes
 
-        if not self._test:
-            self._config.read('config/config.ini', encoding='utf-8')
-        else:
-            self._config.read('config/test_config.ini', encoding='utf-8')
+    def reload(self):
+        changes = self.load()
+        for paths, callback in list(self._subscribers):
+            relevant = {path: change for path, change in changes.items() if paths is None or path in paths}
+            if relevant:
+                callback(relevant)
+        return changes
 
-        sections = self._config.sections()
-        for section in sections:
-            options = self._config.options(section)
-            for option in options:
-                value = self._config.get(section, option)
-                self._loaded_config[f'{section.lower()}.{option.lower()}'] = value
+    def subscribe(self, callback, *paths):
+        subscriber = (frozenset(path.lower() for path in paths) or None, callback)
+        self._subscribers.append(subscriber)
+
+        def unsubscribe():
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+
+        return unsubscribe
+
+    async def watch(self, logger):
+        while True:
+            await asyncio.sleep(self.core.config_reload_interval)
+            if self._last_modified() == self._modified:
+                continue
+            try:
+                changes = self.reload()
+            except ConfigError as ex:
+                logger.error(f'[CONFIG] Failed to reload the config, keeping the previous one: {ex}')
+                continue
+            if changes:
+                logger.info(f'[CONFIG] Reloaded the config, changed: {", ".join(sorted(changes))}')
 
     def get(self, path: str):
-        path = path.lower()
-        if not self._loaded_config.__contains__(path):
-            return None
-        return self._loaded_config[path]
+        return self._loaded_config.get(path.lower())
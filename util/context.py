@@ -1,3 +1,5 @@
+import time
+
 from discord.ext import commands
 
 
@@ -5,6 +7,7 @@ class Context(commands.Context):
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
+        self.created_at = time.perf_counter()
 
     @property
     def cfg(self):
@@ -0,0 +1,94 @@
+import asyncio
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+
+class CounterBuffer:
+
+    def __init__(self, database, flush_interval=10):
+        self._database = database
+        self.flush_interval = flush_interval
+        self._pending = dict()  # (collection, filter_key, filter_value) -> {operator: {field: value}}
+        self._flush_task = None
+
+    def increment(self, collection, filter_key, filter_value, field, amount=1):
+        fields = self._operator(collection, filter_key, filter_value, '$inc')
+        fields[field] = fields.get(field, 0) + amount
+        self._schedule_flush()
+
+    def maximum(self, collection, filter_key, filter_value, field, value):
+        fields = self._operator(collection, filter_key, filter_value, '$max')
+        if field not in fields or fields[field] < value:
+            fields[field] = value
+        self._schedule_flush()
+
+    def set(self, collection, filter_key, filter_value, field, value):
+        fields = self._operator(collection, filter_key, filter_value, '$set')
+        fields[field] = value
+        self._schedule_flush()
+
+    def pending(self, collection, filter_key, filter_value, operator, field, default=None):
+        operations = self._pending.get((collection, filter_key, filter_value), dict())
+        return operations.get(operator, dict()).get(field, default)
+
+    async def flush(self):
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, dict()
+        operations = dict()
+        keys = dict()  # collection -> pending keys in the order of its operations
+        for key, update in pending.items():
+            collection, filter_key, filter_value = key
+            operation = UpdateOne({filter_key: filter_value}, self._database.touch(update))
+            operations.setdefault(collection, list()).append(operation)
+            keys.setdefault(collection, list()).append(key)
+        written = set()
+        failed = set()
+        try:
+            for collection, collection_operations in operations.items():
+                try:
+                    await self._database.bulk_write(collection, collection_operations)
+                except BulkWriteError as ex:
+                    # The write is unordered, every operation without a write error was applied
+                    failed.update(keys[collection][error['index']] for error in ex.details.get('writeErrors', ()))
+                    written.add(collection)
+                    raise
+                written.add(collection)
+        except Exception:
+            # Collections written before the failure are acknowledged, re-queueing them would apply $inc twice
+            for key, update in pending.items():
+                if key[0] not in written or key in failed:
+                    self._merge(key, update)
+            raise
+
+    def _operator(self, collection, filter_key, filter_value, operator):
+        operations = self._pending.setdefault((collection, filter_key, filter_value), dict())
+        return operations.setdefault(operator, dict())
+
+    def _merge(self, key, update):
+        # Re-queue a failed flush without losing increments made in the meantime
+        collection, filter_key, filter_value = key
+        for field, amount in update.get('$inc', dict()).items():
+            fields = self._operator(collection, filter_key, filter_value, '$inc')
+            fields[field] = fields.get(field, 0) + amount
+        for field, value in update.get('$max', dict()).items():
+            fields = self._operator(collection, filter_key, filter_value, '$max')
+            if field not in fields or fields[field] < value:
+                fields[field] = value
+        for field, value in update.get('$set', dict()).items():
+            self._operator(collection, filter_key, filter_value, '$set').setdefault(field, value)
+
+    def _schedule_flush(self):
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.get_event_loop().create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.flush_interval)
+        try:
+            await self.flush()
+        except Exception:
+            self._database._bot.logger.exception('[DATABASE] Failed to flush counters!')
+        self._flush_task = None
+        if self._pending:
+            self._schedule_flush()
@@ -1,44 +1,158 @@
 import asyncio
+import copy
 import datetime
+import re
 
 import pytz
+from pymongo import ASCENDING, IndexModel, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, OperationFailure
+
+from util.backends import create_client, preload_backend
+from util.cache import LRUCache, MISSING
+from util.counters import CounterBuffer
+from util.document import Document, DocumentConflict
+from util.migration import CollectionMigration
+from util.monitoring import CommandMonitor, PoolMonitor
+from util.snapshot import Snapshot
 
 
 class Database:
 
     def __init__(self, bot):
         self._bot = bot
+        self.cfg = bot.cfg
+        self.timestamp_field = 'updated_at'
+        self._ready = asyncio.Event()
+        self._client = None
+        self._database = None
+        self._setup_task = None
 
         self.guilds = GuildManager(self)
         self.stats = StatsManager(bot, self)
         self.storage = StorageManager(self)
 
+        self._indexes = list()
+        self.index_report = dict()
+        for manager in (self.guilds, self.stats, self.storage):
+            self.register_indexes(*manager.indexes)
+
+        self.snapshots = Snapshot(self, self.cfg.database.snapshot_directory,
+                                  batch_size=self.cfg.database.snapshot_batch_size)
+
+    async def close(self):
+        await self.guilds.close()
+        await self.stats.flush()
+
+    async def connect(self):
+        # The backend is imported off the loop, so the bot can log in and load its cogs in the meantime
+        await asyncio.get_event_loop().run_in_executor(None, preload_backend, self.cfg.database.connect_uri)
         self._connect()
 
     def _connect(self):
-        from motor.motor_asyncio import AsyncIOMotorClient
+        self.command_monitor = CommandMonitor(self._bot, self.cfg.database.slow_query_threshold)
+        self.pool_monitor = PoolMonitor(self._bot)
 
         self._bot.logger.info('[DATABASE] Connecting to Database...')
-        self._client = AsyncIOMotorClient(self._bot.cfg.get('Database.ConnectURI'))
-        self._bot.logger.info('[DATABASE] Successfully connected to the database!')
-        self._database = self._client[self._bot.cfg.get('Database.DatabaseName')]
-
-        asyncio.get_event_loop().create_task(self._setup())
+        self._client = create_client(self.cfg.database.connect_uri,
+                                     event_listeners=[self.command_monitor, self.pool_monitor])
+        self._database = self._client[self.cfg.database.database_name]
+
+        self._setup_task = asyncio.get_event_loop().create_task(self._setup())
+        self._setup_task.add_done_callback(self._on_setup_done)
+
+    def _on_setup_done(self, task):
+        if not task.cancelled() and task.exception() is not None:
+            self._bot.logger.error('[DATABASE] Failed to set up the database!', exc_info=task.exception())
+
+    def register_indexes(self, *indexes):
+        self._indexes.extend(indexes)
+
+    def unique_key(self, collection: str):
+        for index in self._indexes:
+            if index.collection == collection and index.unique and len(index.key) == 1:
+                return index.key[0][0]
+        return None
+
+    async def ensure_indexes(self):
+        report = {
+            'created': [],
+            'drift': [],
+            'unknown': [],
+            'failed': []
+        }
+        collections = dict()
+        for index in self._indexes:
+            collections.setdefault(index.collection, list()).append(index)
+
+        for collection_name, indexes in collections.items():
+            collection = self._database[collection_name]
+            existing = {Index.normalize_key(info['key']): (name, info)
+                        for name, info in (await collection.index_information()).items()}
+            registered_keys = set()
+            for index in indexes:
+                registered_keys.add(index.key)
+                if index.key not in existing:
+                    self._bot.logger.warning(f'[DATABASE] Missing index {index} - creating it...')
+                    try:
+                        await collection.create_indexes([index.model()])
+                        report['created'].append(str(index))
+                    except Exception:
+                        self._bot.logger.exception(f'[DATABASE] Failed to create index {index}!')
+                        report['failed'].append(str(index))
+                    continue
+                name, info = existing[index.key]
+                if not index.matches(info):
+                    self._bot.logger.warning(f'[DATABASE] Index {collection_name}.{name} differs from {index}!')
+                    report['drift'].append(str(index))
+            for key, (name, _) in existing.items():
+                if name != '_id_' and key not in registered_keys:
+                    report['unknown'].append(f'{collection_name}.{name}')
+
+        if report['unknown']:
+            self._bot.logger.info(f'[DATABASE] Unregistered indexes: {", ".join(report["unknown"])}')
+        self.index_report = report
+        return report
+
+    async def wait_until_ready(self):
+        await self._ready.wait()
+
+    def is_ready(self):
+        return self._ready.is_set()
 
     async def _setup(self):
-        if await self._is_setup():
-            return
-        self._bot.logger.info('[DATABASE] Setup Database...')
-        requests = {
-            'name': 'Requests',
-            'score': 0
-        }
-        servers = {
-            'name': 'Guilds',
-            'score': 0,
-            'highscore': 0
-        }
-        await self._database['Stats'].insert_many([requests, servers])
+        # Every step is retried, on_ready waits for the database and would otherwise never continue
+        attempt = 0
+        while True:
+            try:
+                await self._setup_database()
+                break
+            except Exception as ex:
+                delay = min(2 ** attempt, 30)
+                attempt += 1
+                self._bot.logger.warning(f'[DATABASE] Failed to set up the database ({ex}), retrying in {delay} '
+                                         f'seconds...')
+                await asyncio.sleep(delay)
+        # Only ready once the indexes and the seed documents exist
+        self._ready.set()
+
+    async def _setup_database(self):
+        await self._database.command('ping')
+        self._bot.logger.info('[DATABASE] Successfully connected to the database!')
+        await self.ensure_indexes()
+        if self.cfg.database.watch_storage:
+            self.storage.start_watching()
+        if not await self._is_setup():
+            self._bot.logger.info('[DATABASE] Setup Database...')
+            requests = {
+                'name': 'Requests',
+                'score': 0
+            }
+            servers = {
+                'name': 'Guilds',
+                'score': 0,
+                'highscore': 0
+            }
+            await self._database['Stats'].insert_many([requests, servers])
 
     async def _is_setup(self):
         db_filter = {
@@ -52,31 +166,101 @@ class Database:
         }
         return await self._database[collection].find_one(db_filter)
 
+    def touch(self, update_operation):
+        # Keeps the modification timestamp incremental snapshots are based on up to date. Other operators may not
+        # write the field as well, Mongo rejects updates touching a path twice
+        update_operation = {operator: {field: value for field, value in fields.items() if field != self.timestamp_field}
+                            for operator, fields in update_operation.items()}
+        update_operation = {operator: fields for operator, fields in update_operation.items() if fields}
+        update_operation['$currentDate'] = {self.timestamp_field: True}
+        return update_operation
+
+    async def server_time(self):
+        # $currentDate uses the server clock, cut-offs compared against it must not come from the local one
+        try:
+            response = await self._database.command('hello')
+        except OperationFailure:
+            response = await self._database.command('isMaster')
+        return response['localTime']
+
+    def get_collection(self, collection: str):
+        return self._database[collection]
+
+    async def list_collection_names(self):
+        return await self._database.list_collection_names()
+
+    async def create_collection(self, collection: str):
+        return await self._database.create_collection(collection)
+
     def get_cursor_by_filter(self, collection: str, db_filter):
         return self._database[collection].find(db_filter)
 
-    async def set_document_value(self, collection, filter_key, filer_value, key, value):
-        document = await self.get_document(collection, filter_key, filer_value)
-        document[key] = value
+    async def set_document_value(self, collection, filter_key, filer_value, key, value, upsert=False):
         db_filter = {
             filter_key: filer_value
         }
         update_operation = {
-            "$set": document
+            "$set": {
+                key: value
+            }
         }
-        await self._database[collection].update_one(db_filter, update_operation, upsert=False)
+        await self._database[collection].update_one(db_filter, self.touch(update_operation), upsert=upsert)
 
     async def set_document_full(self, collection, filter_key, filer_value, document):
         db_filter = {
             filter_key: filer_value
         }
         update_operation = {
-            "$set": document
+            "$set": {key: value for key, value in document.items() if key not in ('_id', self.timestamp_field)}
+        }
+        await self._database[collection].update_one(db_filter, self.touch(update_operation), upsert=False)
+
+    async def patch_document(self, collection, filter_key, filter_value, document: Document, upsert=False):
+        if upsert and document.version_field:
+            # A stale version would not match and insert a duplicate, a missing one fails to $inc
+            raise ValueError('Versioned documents can not be upserted.')
+        # The filter needs the version the document was read with, collecting the patch increments it
+        db_filter = document.patch_filter({filter_key: filter_value})
+        update_operation = document.collect_patch()
+        if not update_operation:
+            return
+        try:
+            result = await self._database[collection].update_one(db_filter, self.touch(update_operation),
+                                                                 upsert=upsert)
+        except Exception:
+            document.restore_patch(update_operation)
+            raise
+        if document.version_field and result.matched_count == 0 and result.upserted_id is None:
+            # The changes stay pending, the caller can re-read the document and apply them again
+            document.restore_patch(update_operation)
+            raise DocumentConflict(f'{collection} document {filter_key}={filter_value} was modified concurrently.')
+        return result
+
+    async def get_or_add_document(self, collection, filter_key, filter_value, document):
+        db_filter = {
+            filter_key: filter_value
         }
-        await self._database[collection].update_one(db_filter, update_operation, upsert=False)
+        # $currentDate also applies to a matched document, existing ones are read first to keep their timestamp
+        existing = await self._database[collection].find_one(db_filter)
+        if existing is not None:
+            return existing
+        update_operation = self.touch({
+            "$setOnInsert": document
+        })
+        return await self._database[collection].find_one_and_update(db_filter, update_operation, upsert=True,
+                                                                     return_document=ReturnDocument.AFTER)
+
+    async def add_document(self, collection, filter_key, document):
+        # An upsert, so the timestamp comes from the server clock like for every other write
+        db_filter = {
+            filter_key: document[filter_key]
+        }
+        result = await self._database[collection].update_one(db_filter, self.touch({'$setOnInsert': document}),
+                                                             upsert=True)
+        return result.upserted_id is not None
 
-    async def add_document(self, collection, document):
-        await self._database[collection].insert_one(document)
+    async def bulk_write(self, collection, operations, ordered=False):
+        return await self._database[collection].bulk_write(operations, ordered=ordered)
 
     async def count_documents_by_filter(self, collection, db_filter):
         return await self._database[collection].count_documents(db_filter)
@@ -84,64 +268,101 @@ class Database:
     # REFORMAT THE DATABASE                                          hopefully
     async def reformat_database(self):
         self._bot.logger.info('Start...')
-        guilds = dict()
-        collection = self._database['GuildData']
-        cursor = collection.find({})
-        async for document in cursor:
-            g_id = str(document['guild_id'])
-            if g_id in guilds:
-                continue
-            guilds[g_id] = document
+        await self.guilds.flush()
+
+        async def prepare(staging):
+            await staging.create_indexes([index.model() for index in self.guilds.indexes])
+
+        migration = CollectionMigration(self, 'reformat', 'GuildData', 'GuildData', transform=self._reformat_guild,
+                                        batch_size=self.cfg.database.migration_batch_size)
+        await migration.run(prepare)
+        self.guilds.clear_cache()
+
+    def _reformat_guild(self, value):
+        try:
+            guild_doc = {
+                'guild_id': int(value['guild_id']),
+                'lang': value['lang'],
+                'premium': value['premium'],
+                'delete_invoke': value['delete_invoke'],
+                'disabled_ads': value['disabled_ads'],
+                'permissions_warn': value['permissions_warn'],
+            }
+        except Exception as ex:
+            self._bot.logger.info('Error:')
+            self._bot.logger.info('Server ID: ' + str(value.get('guild_id')))
+            self._bot.logger.info('Last Status Info: ' + str(value.get('last_status_info')))
+            self._bot.logger.info('Last Shop Info: ' + str(value.get('last_shop_info')))
+            self._bot.logger.info('Last Challenge Info: ' + str(value.get('last_challenge_info')))
+            self._bot.logger.info(' ')
+            raise ex
+        # Duplicates are dropped by only inserting the first document of every guild
+        return UpdateOne({'guild_id': guild_doc['guild_id']}, self.touch({'$setOnInsert': guild_doc}), upsert=True)
 
-        new_docs = list()
+    async def backup_database(self):
+        await self.guilds.flush()
+        migration = CollectionMigration(self, 'backup', 'GuildData', 'GuildData_Backup',
+                                        batch_size=self.cfg.database.migration_batch_size)
+        await migration.run()
 
-        for key, value in guilds.items():
-            try:
-                guild_doc = {
-                    'guild_id': int(key),
-                    'lang': value['lang'],
-                    'premium': value['premium'],
-                    'delete_invoke': value['delete_invoke'],
-                    'disabled_ads': value['disabled_ads'],
-                    'permissions_warn': value['permissions_warn'],
-                }
 
-            except Exception as ex:
-                self._bot.logger.info('Error:')
-                self._bot.logger.info('Server ID: ' + str(key))
-                self._bot.logger.info('Last Status Info: ' + str(value['last_status_info']))
-                self._bot.logger.info('Last Shop Info: ' + str(value['last_shop_info']))
-                self._bot.logger.info('Last Challenge Info: ' + str(value['last_challenge_info']))
-                self._bot.logger.info(' ')
-                raise ex
-            new_docs.append(guild_doc)
-
-        await collection.delete_many({})
-        await collection.insert_many(new_docs)
+class Index:
 
-    async def backup_database(self):
-        cursor = self._database['GuildData'].find({})
-        guild_documents = list()
-        async for doc in cursor:
-            guild_documents.append(doc)
-        await self._database['GuildData_Backup'].delete_many({})
-        await self._database['GuildData_Backup'].insert_many(guild_documents)
+    def __init__(self, collection: str, keys, unique=False, **options):
+        self.collection = collection
+        self.key = ((keys, ASCENDING),) if isinstance(keys, str) else tuple(keys)
+        self.unique = unique
+        self.options = options
+
+    def __str__(self):
+        fields = ', '.join(field for field, _ in self.key)
+        return f'{self.collection}({fields}{", unique" if self.unique else ""})'
+
+    @staticmethod
+    def normalize_key(key):
+        # Indexes created from the shell store their direction as a float
+        return tuple((field, int(direction) if isinstance(direction, float) else direction) for field, direction in key)
+
+    def model(self):
+        return IndexModel(list(self.key), unique=self.unique, **self.options)
+
+    def matches(self, info):
+        if bool(info.get('unique', False)) != self.unique:
+            return False
+        return all(info.get(option) == value for option, value in self.options.items() if option != 'name')
 
 
 class GuildManager:
 
+    indexes = (
+        Index('GuildData', 'guild_id', unique=True),
+    )
+
     def __init__(self, database: Database):
         self.database = database
         self.collection_name = 'GuildData'
 
+        self._cache = LRUCache()
+        self._flush_interval = None
+        self._configure()
+        database.cfg.subscribe(self._configure, 'Database.GuildCacheSize', 'Database.GuildCacheTTL',
+                               'Database.GuildCacheBytes', 'Database.FlushInterval')
+        self._dirty = dict()  # guild_id -> Document with unflushed changes
+        self._flush_task = None
+        self._flushing = False
+
+    def _configure(self, changes=None):
+        config = self.database.cfg.database
+        self._cache.resize(config.guild_cache_size, config.guild_cache_ttl, config.guild_cache_bytes)
+        self._flush_interval = config.flush_interval
+
     async def exists(self, guild_id: int):
+        if guild_id in self._cache:
+            return True
         return await self.database.get_document(self.collection_name, 'guild_id', guild_id) is not None
 
-    async def add(self, guild_id: int):
-        if await self.exists(guild_id):
-            return
-
-        guild_doc = {
+    def default_document(self, guild_id: int):
+        return {
             'guild_id': guild_id,
             'lang': 'en-EN',
             'premium': False,
@@ -152,7 +373,20 @@ class GuildManager:
             'counters': [],
             'log_channel': None
         }
-        await self.database.add_document(self.collection_name, guild_doc)
+
+    def _upsert_operation(self, guild_id: int, guild_doc=None):
+        return UpdateOne({'guild_id': guild_id},
+                         self.database.touch({'$setOnInsert': guild_doc or self.default_document(guild_id)}),
+                         upsert=True)
+
+    async def add(self, guild_id: int):
+        if guild_id in self._cache:
+            return self._cache.get(guild_id)
+        guild_doc = self.default_document(guild_id)
+        result = await self.database.bulk_write(self.collection_name, [self._upsert_operation(guild_id, guild_doc)])
+        if result.upserted_count:
+            return guild_doc
+        return await self.database.get_document(self.collection_name, 'guild_id', guild_id)
 
     example_object = [
         {
@@ -162,65 +396,169 @@ class GuildManager:
         },
     ]
 
+    async def warm_up(self, guild_ids):
+        guild_ids = list(guild_ids)[:self._cache.max_size]
+        if not guild_ids:
+            return
+        cursor = self.get_data_by_filter({'guild_id': {'$in': guild_ids}})
+        counter = 0
+        async for document in cursor:
+            self._cache_document(document['guild_id'], document)
+            counter += 1
+        self.database._bot.logger.info(f'[DATABASE] Cached {counter} of {len(guild_ids)} Guilds.')
+
     async def get_data(self, guild_id: int):
-        if not await self.exists(guild_id):
-            await self.add(guild_id)
-        return await self.database.get_document(self.collection_name, 'guild_id', guild_id)
+        # A copy, changes have to go through set_value or set_data to be written
+        return copy.deepcopy(dict(await self._get_document(guild_id)))
+
+    async def _get_document(self, guild_id: int):
+        document = self._dirty.get(guild_id)
+        if document is None:
+            document = self._cache.get(guild_id)
+        if document is not None:
+            return document
+        document = await self.database.get_document(self.collection_name, 'guild_id', guild_id)
+        if document is None:
+            document = await self.add(guild_id)
+        return self._cache_document(guild_id, document)
 
     async def set_value(self, guild_id: int, key: str, value):
-        if not await self.exists(guild_id):
-            await self.add(guild_id)
-        cache_doc = await self.get_data(guild_id)
-        cache_doc[key] = value
-        await self.set_data(guild_id, cache_doc)
+        document = await self._get_document(guild_id)
+        document[key] = value
+        self._mark_dirty(guild_id, document)
 
     async def set_data(self, guild_id: int, document):
-        if not await self.exists(guild_id):
-            await self.add(guild_id)
-        await self.database.set_document_full(self.collection_name, 'guild_id', guild_id, document)
+        cached = await self._get_document(guild_id)
+        # The id never changes and the timestamp is written by the server, a document read later differs in both
+        ignored = ('_id', self.database.timestamp_field)
+        cached.update({key: value for key, value in document.items()
+                       if key not in ignored and cached.get(key) != value})
+        self._mark_dirty(guild_id, cached)
 
     def get_data_by_filter(self, db_filter):
         return self.database.get_cursor_by_filter(self.collection_name, db_filter)
 
     async def count_by_filter(self, db_filter):
+        await self.flush()
         return await self.database.count_documents_by_filter(self.collection_name, db_filter)
 
     async def add_all(self):
-        counter = 0
-        for guild in self.database._bot.guilds:
-            await self.add(guild)
-            counter += 1
-        self.database._bot.logger.info(f'[DATABASE] Adding {counter} Guilds to the database!')
+        guild_ids = [guild.id for guild in self.database._bot.guilds]
+        chunk_size = self.database.cfg.database.bulk_chunk_size
+        inserted = 0
+        for index in range(0, len(guild_ids), chunk_size):
+            chunk = guild_ids[index:index + chunk_size]
+            # The upserts stamp matched documents as well, only the missing guilds are written
+            cursor = self.database.get_collection(self.collection_name).find({'guild_id': {'$in': chunk}},
+                                                                              {'guild_id': True, '_id': False})
+            stored = {document['guild_id'] async for document in cursor}
+            operations = [self._upsert_operation(guild_id) for guild_id in chunk if guild_id not in stored]
+            if not operations:
+                continue
+            result = await self.database.bulk_write(self.collection_name, operations)
+            inserted += result.upserted_count
+        existing = len(guild_ids) - inserted
+        self.database._bot.logger.info(f'[DATABASE] Added {inserted} Guilds to the database, {existing} already existed!')
+        return inserted, existing
+
+    async def flush(self):
+        if not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, dict()
+        patches = {guild_id: document.collect_patch() for guild_id, document in dirty.items()}
+        guild_ids = [guild_id for guild_id, patch in patches.items() if patch]
+        operations = [UpdateOne({'guild_id': guild_id}, self.database.touch(patches[guild_id]))
+                      for guild_id in guild_ids]
+        try:
+            if operations:
+                await self.database.bulk_write(self.collection_name, operations)
+        except Exception as ex:
+            if isinstance(ex, BulkWriteError):
+                # The write is unordered, restoring an applied patch would push its values a second time
+                failed = {guild_ids[error['index']] for error in ex.details.get('writeErrors', ())}
+                dirty = {guild_id: document for guild_id, document in dirty.items() if guild_id in failed}
+            for guild_id, document in dirty.items():
+                document.restore_patch(patches[guild_id])
+                self._dirty[guild_id] = document
+            raise
+
+    def clear_cache(self):
+        self._cache.clear()
+
+    def _cache_document(self, guild_id, document):
+        document = Document(document)
+        self._cache.set(guild_id, document)
+        return document
+
+    def _mark_dirty(self, guild_id, document):
+        if not document.dirty:
+            return
+        self._dirty[guild_id] = document
+        # Storing it again measures the changed document for the byte limit
+        self._cache.set(guild_id, document)
+        self._schedule_flush()
+
+    def _schedule_flush(self):
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.get_event_loop().create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self._flush_interval)
+        self._flushing = True
+        try:
+            await self.flush()
+        except Exception:
+            self.database._bot.logger.exception('[DATABASE] Failed to flush guild data!')
+        finally:
+            self._flushing = False
+        self._flush_task = None
+        if self._dirty:
+            self._schedule_flush()
+
+    async def close(self):
+        # A flush already writing is waited for, a scheduled one is replaced by the final flush
+        while self._flush_task is not None and not self._flush_task.done():
+            if not self._flushing:
+                self._flush_task.cancel()
+                break
+            await self._flush_task
+        await self.flush()
 
 
 class StatsManager:
 
+    indexes = (
+        Index('Stats', 'name', unique=True),
+        Index('DailyStats', 'date', unique=True),
+    )
+
     def __init__(self, bot, database: Database):
         self.bot = bot
         self._database = database
+        self._counters = CounterBuffer(database, database.cfg.database.counter_flush_interval)
+        database.cfg.subscribe(self._configure, 'Database.CounterFlushInterval')
+
+    def _configure(self, changes=None):
+        self._counters.flush_interval = self._database.cfg.database.counter_flush_interval
 
     async def add_stats_request(self):
-        old = (await self._database.get_document('Stats', 'name', 'Requests'))['score']
-        new = old + 1
-        await self._database.set_document_value('Stats', 'name', 'Requests', 'score', new)
+        self._counters.increment('Stats', 'name', 'Requests', 'score')
 
     async def get_requests(self):
-        return (await self._database.get_document('Stats', 'name', 'Requests'))['score']
+        score = (await self._database.get_document('Stats', 'name', 'Requests'))['score']
+        return score + self._counters.pending('Stats', 'name', 'Requests', '$inc', 'score', 0)
 
     async def set_guild_amount(self):
         curr_guild_amount = self._database._bot.utils.bot_stats.guilds()
-        guild_document = await self._database.get_document('Stats', 'name', 'Guilds')
-        old_guild_amount = guild_document['score']
-        if curr_guild_amount == old_guild_amount:
-            return
-        await self._database.set_document_value('Stats', 'name', 'Guilds', 'score', curr_guild_amount)
-        highscore = guild_document['highscore']
-        if curr_guild_amount <= highscore:
-            return
-        await self._database.set_document_value('Stats', 'name', 'Guilds', 'highscore', curr_guild_amount)
+        self._counters.set('Stats', 'name', 'Guilds', 'score', curr_guild_amount)
+        self._counters.maximum('Stats', 'name', 'Guilds', 'highscore', curr_guild_amount)
 
     async def get_guild_max(self):
-        return (await self._database.get_document('Stats', 'name', 'Guilds'))['highscore']
+        highscore = (await self._database.get_document('Stats', 'name', 'Guilds'))['highscore']
+        return max(highscore, self._counters.pending('Stats', 'name', 'Guilds', '$max', 'highscore', highscore))
+
+    async def flush(self):
+        await self._counters.flush()
 
     async def set_daily_stats(self):
         current_date = datetime.datetime.now(pytz.timezone('UTC')).strftime('%Y-%m-%d')
@@ -233,33 +571,122 @@ class StatsManager:
             "av_user": float(f'{await self.bot.utils.bot_stats.average_user():.2f}'),
             "unique_user": await self.bot.utils.bot_stats.unique_users()
         }
-        await self._database.add_document('DailyStats', stats_doc)
+        await self._database.add_document('DailyStats', 'date', stats_doc)
 
 
 class StorageManager:
 
+    indexes = (
+        Index('Storage', 'path', unique=True),
+    )
+
+    default_value = 'None'
+
     def __init__(self, database: Database):
         self._database = database
         self._collection_name = 'Storage'
 
+        # Without a change stream other processes' writes only become visible once the TTL expires
+        self._cache = LRUCache()
+        self._configure()
+        database.cfg.subscribe(self._configure, 'Database.StorageCacheSize', 'Database.StorageCacheTTL')
+        self._watch_task = None
+
+    def _configure(self, changes=None):
+        config = self._database.cfg.database
+        self._cache.resize(config.storage_cache_size, config.storage_cache_ttl)
+
     async def exists(self, path):
+        if path in self._cache:
+            return True
         return await self._database.get_document(self._collection_name, 'path', path) is not None
 
     async def add(self, path):
-        if await self.exists(path):
-            return
-        user_doc = {
+        document = await self._database.get_or_add_document(self._collection_name, 'path', path, {
             'path': path,
-            'value': 'None',
-        }
-        await self._database.add_document(self._collection_name, user_doc)
+            'value': self.default_value,
+        })
+        self._cache.set(path, document['value'])
 
     async def set(self, path, value):
-        if not await self.exists(path):
-            await self.add(path)
-        await self._database.set_document_value(self._collection_name, 'path', path, 'value', value)
+        await self._database.set_document_value(self._collection_name, 'path', path, 'value', value, upsert=True)
+        self._cache.set(path, value)
 
     async def get(self, path):
-        if not await self.exists(path):
-            await self.add(path)
-        return (await self._database.get_document(self._collection_name, 'path', path))['value']
+        value = self._cache.get(path, MISSING)
+        if value is not MISSING:
+            return value
+        await self.add(path)
+        return self._cache.get(path, self.default_value)
+
+    async def get_many(self, paths):
+        values = dict()
+        missing = list()
+        for path in paths:
+            value = self._cache.get(path, MISSING)
+            if value is MISSING:
+                missing.append(path)
+            else:
+                values[path] = value
+        if not missing:
+            return values
+
+        async for document in self._database.get_cursor_by_filter(self._collection_name, {'path': {'$in': missing}}):
+            values[document['path']] = document['value']
+            self._cache.set(document['path'], document['value'])
+
+        new_paths = [path for path in missing if path not in values]
+        if new_paths:
+            operations = [UpdateOne({'path': path},
+                                    self._database.touch({'$setOnInsert': {'path': path, 'value': self.default_value}}),
+                                    upsert=True) for path in new_paths]
+            await self._database.bulk_write(self._collection_name, operations)
+            for path in new_paths:
+                values[path] = self.default_value
+                self._cache.set(path, self.default_value)
+        return values
+
+    async def set_many(self, values: dict):
+        if not values:
+            return
+        operations = [UpdateOne({'path': path}, self._database.touch({'$set': {'value': value}}), upsert=True)
+                      for path, value in values.items()]
+        await self._database.bulk_write(self._collection_name, operations)
+        for path, value in values.items():
+            self._cache.set(path, value)
+
+    async def scan(self, prefix: str):
+        prefix = prefix.rstrip('*')
+        # An anchored, case sensitive regex is answered from the path index
+        db_filter = {'path': {'$regex': f'^{re.escape(prefix)}'}}
+        values = dict()
+        async for document in self._database.get_cursor_by_filter(self._collection_name, db_filter):
+            values[document['path']] = document['value']
+            self._cache.set(document['path'], document['value'])
+        return values
+
+    def start_watching(self):
+        if self._watch_task is None or self._watch_task.done():
+            self._watch_task = asyncio.get_event_loop().create_task(self._watch())
+
+    def stop_watching(self):
+        if self._watch_task:
+            self._watch_task.cancel()
+            self._watch_task = None
+
+    async def _watch(self):
+        collection = self._database.get_collection(self._collection_name)
+        try:
+            async with collection.watch(full_document='updateLookup') as stream:
+                self._database._bot.logger.info('[DATABASE] Watching the storage for changes...')
+                async for change in stream:
+                    document = change.get('fullDocument')
+                    if document is not None:
+                        self._cache.set(document['path'], document['value'])
+                    elif change['operationType'] in ('delete', 'drop', 'rename', 'invalidate'):
+                        # Deletions only carry the _id, so the affected path is unknown
+                        self._cache.clear()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self._database._bot.logger.exception('[DATABASE] Storage change stream failed, relying on the cache TTL!')
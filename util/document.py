@@ -0,0 +1,103 @@
+class DocumentConflict(Exception):
+    pass
+
+
+class Document(dict):
+
+    def __init__(self, data=None, version_field=None):
+        super().__init__(data or dict())
+        self.version_field = version_field
+
+        self._set = dict()
+        self._unset = set()
+        self._push = dict()
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        if key == '_id':
+            return
+        self._set[key] = value
+        self._unset.discard(key)
+        self._push.pop(key, None)
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self._set.pop(key, None)
+        self._push.pop(key, None)
+        self._unset.add(key)
+
+    def update(self, other=(), **kwargs):
+        for key, value in dict(other, **kwargs).items():
+            self[key] = value
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def pop(self, key, *default):
+        if key not in self:
+            return super().pop(key, *default)
+        value = self[key]
+        del self[key]
+        return value
+
+    def push(self, key, value):
+        super().setdefault(key, list()).append(value)
+        if key in self._set:
+            return
+        if key in self._unset:
+            # The server still has the deleted list, pushing would append to it instead of starting a new one
+            self._unset.discard(key)
+            self._set[key] = self[key]
+            return
+        self._push.setdefault(key, list()).append(value)
+
+    @property
+    def dirty(self):
+        return bool(self._set or self._unset or self._push)
+
+    @property
+    def version(self):
+        return self.get(self.version_field) if self.version_field else None
+
+    def patch(self):
+        update = dict()
+        if self._set:
+            update['$set'] = dict(self._set)
+        if self._unset:
+            update['$unset'] = {key: '' for key in self._unset}
+        if self._push:
+            update['$push'] = {key: {'$each': list(values)} for key, values in self._push.items()}
+        if update and self.version_field:
+            update['$inc'] = {self.version_field: 1}
+        return update
+
+    def patch_filter(self, db_filter):
+        if not self.version_field:
+            return db_filter
+        # A missing version field matches None, so unversioned documents can be patched once
+        return dict(db_filter, **{self.version_field: self.version})
+
+    def collect_patch(self):
+        update = self.patch()
+        self._set.clear()
+        self._unset.clear()
+        self._push.clear()
+        if update and self.version_field:
+            super().__setitem__(self.version_field, (self.version or 0) + 1)
+        return update
+
+    def restore_patch(self, update):
+        # Re-queue a patch which could not be written; newer local changes win
+        for key, value in update.get('$set', dict()).items():
+            if key not in self._set and key not in self._unset:
+                self._set[key] = value
+        for key in update.get('$unset', dict()):
+            if key not in self._set:
+                self._unset.add(key)
+        for key, values in update.get('$push', dict()).items():
+            if key not in self._set and key not in self._unset:
+                self._push[key] = values['$each'] + self._push.get(key, list())
+        if self.version_field and '$inc' in update:
+            super().__setitem__(self.version_field, (self.version or 0) - 1)
@@ -0,0 +1,133 @@
+import asyncio
+import time
+
+import discord
+
+
+class RateLimitBucket:
+
+    def __init__(self, rate, per):
+        self.rate = rate
+        self.per = per
+        self._allowance = rate
+        self._updated = time.monotonic()
+
+    def reserve(self):
+        # Reserves the next slot and returns how long to wait for it, reservations queue up behind each other
+        now = time.monotonic()
+        self._allowance = min(self.rate, self._allowance + (now - self._updated) * self.rate / self.per)
+        self._updated = now
+        self._allowance -= 1
+        if self._allowance >= 0:
+            return 0.0
+        return -self._allowance * self.per / self.rate
+
+    def idle(self, now=None):
+        # Full again and no reservation waiting, replacing the bucket with a new one changes nothing
+        now = time.monotonic() if now is None else now
+        return self._allowance + (now - self._updated) * self.rate / self.per >= self.rate
+
+
+class PendingEdit:
+
+    __slots__ = ('message', 'fields', 'futures')
+
+    def __init__(self, message, fields, futures):
+        self.message = message
+        self.fields = fields
+        self.futures = futures
+
+
+class MessageEditor:
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.rate = None
+        self.per = None
+        self._pending = dict()  # message_id -> PendingEdit
+        self._workers = dict()  # message_id -> Task
+        # Edits share the bucket of their channel, only idle buckets are dropped
+        self._buckets = dict()  # channel_id -> RateLimitBucket
+        self.max_buckets = 4096
+        self._configure()
+        bot.cfg.subscribe(self._configure, 'Selection.EditRate', 'Selection.EditPer')
+
+        self._sent = bot.metrics.counter('discord_message_edits_total', 'Message edits sent')
+        self._coalesced = bot.metrics.counter('discord_message_edits_coalesced_total',
+                                              'Message edits superseded by a newer edit before sending')
+        self._dropped = bot.metrics.counter('discord_message_edits_dropped_total',
+                                            'Message edits discarded or rejected by Discord')
+
+    @classmethod
+    def of(cls, bot):
+        editor = getattr(bot, 'message_editor', None)
+        if editor is None:
+            editor = bot.message_editor = cls(bot)
+        return editor
+
+    def _configure(self, changes=None):
+        self.rate = self.bot.cfg.selection.edit_rate
+        self.per = self.bot.cfg.selection.edit_per
+        # Buckets with the old limits are dropped
+        self._buckets.clear()
+
+    def edit(self, message, **fields):
+        # Resolves with True once this or a newer state of the message was sent, False if it was dropped
+        future = self.bot.loop.create_future()
+        pending = self._pending.get(message.id)
+        if pending is None:
+            self._pending[message.id] = PendingEdit(message, fields, [future])
+        else:
+            self._coalesced.inc()
+            pending.fields.update(fields)
+            pending.futures.append(future)
+        if message.id not in self._workers:
+            self._workers[message.id] = self.bot.loop.create_task(self._work(message))
+        return future
+
+    def discard(self, message):
+        pending = self._pending.pop(message.id, None)
+        if pending is not None:
+            self._dropped.inc()
+            self._resolve(pending, False)
+
+    @staticmethod
+    def _resolve(pending, sent):
+        for future in pending.futures:
+            if not future.done():
+                future.set_result(sent)
+
+    def _bucket(self, channel_id):
+        bucket = self._buckets.get(channel_id)
+        if bucket is None:
+            if len(self._buckets) >= self.max_buckets:
+                now = time.monotonic()
+                self._buckets = {key: bucket for key, bucket in self._buckets.items() if not bucket.idle(now)}
+            bucket = self._buckets[channel_id] = RateLimitBucket(self.rate, self.per)
+        return bucket
+
+    async def _work(self, message):
+        try:
+            while message.id in self._pending:
+                delay = self._bucket(message.channel.id).reserve()
+                if delay:
+                    await asyncio.sleep(delay)
+                # Everything submitted while waiting for the slot is sent as one edit
+                pending = self._pending.pop(message.id, None)
+                if pending is None:
+                    break
+                try:
+                    await pending.message.edit(**pending.fields)
+                except discord.NotFound:
+                    self._dropped.inc()
+                    self._resolve(pending, False)
+                    self.discard(message)
+                    break
+                except discord.HTTPException:
+                    self._dropped.inc()
+                    self._resolve(pending, False)
+                else:
+                    self._sent.inc()
+                    self._resolve(pending, True)
+        finally:
+            del self._workers[message.id]
@@ -0,0 +1,115 @@
+import datetime
+import gzip
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import shutil
+import sys
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+
+class CompressingFileHandler(logging.handlers.BaseRotatingHandler):
+
+    archive_regex = re.compile(r'^(\d{4}-\d{2}-\d{2})-(\d+)\.log(\.gz)?$')
+
+    def __init__(self, directory='logs', max_bytes=0, interval=0):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self._compressor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='log-compressor')
+        self._indexes = dict()  # date -> last archive index
+
+        # A single scan replaces probing for a free name, leftovers of a crash are compressed as well
+        for name in os.listdir(directory):
+            match = self.archive_regex.match(name)
+            if match is None:
+                continue
+            date, index, compressed = match.groups()
+            self._indexes[date] = max(self._indexes.get(date, 0), int(index))
+            if not compressed:
+                self._compress_later(os.path.join(directory, name))
+
+        path = os.path.join(directory, 'latest.log')
+        if os.path.isfile(path) and os.path.getsize(path):
+            self._archive(path)
+        super().__init__(path, 'a', encoding='utf-8')
+        self._rollover_at = time.time() + interval
+
+    def shouldRollover(self, record):
+        if self.interval and time.time() >= self._rollover_at:
+            return True
+        return bool(self.max_bytes and self.stream and self.stream.tell() >= self.max_bytes)
+
+    def doRollover(self):
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+        self._archive(self.baseFilename)
+        self._rollover_at = time.time() + self.interval
+        self.stream = self._open()
+
+    def _archive(self, path):
+        # Renaming is cheap, the compression runs on its own thread and never blocks logging
+        date = datetime.datetime.now().strftime('%Y-%m-%d')
+        self._indexes[date] = self._indexes.get(date, 0) + 1
+        archive = os.path.join(self.directory, f'{date}-{self._indexes[date]}.log')
+        os.replace(path, archive)
+        self._compress_later(archive)
+
+    def _compress_later(self, path):
+        self._compressor.submit(self._compress, path)
+
+    @staticmethod
+    def _compress(path):
+        try:
+            with open(path, 'rb') as f_in, gzip.open(f'{path}.gz', 'wb') as f_out:
+                shutil.copyfileobj(f_in, f_out)
+            os.remove(path)
+        except OSError:
+            traceback.print_exc()
+
+    def close(self):
+        super().close()
+        self._compressor.shutdown(wait=True)
+
+
+class LogPipeline:
+
+    def __init__(self, file_log=True, directory='logs', max_bytes=0, interval=0):
+        log_formatter = logging.Formatter('%(asctime)s:%(levelname)s:%(name)s: %(message)s')
+
+        console_handler = logging.StreamHandler(sys.stdout)
+        console_handler.setLevel(logging.DEBUG)
+        console_handler.setFormatter(log_formatter)
+        handlers = [console_handler]
+
+        if file_log:
+            file_handler = CompressingFileHandler(directory, max_bytes, interval)
+            file_handler.setLevel(logging.DEBUG)
+            file_handler.setFormatter(log_formatter)
+            handlers.append(file_handler)
+
+        # Loggers only enqueue records, writing, rotating and compressing happens on the listener thread
+        self.queue = queue.SimpleQueue()
+        self.listener = logging.handlers.QueueListener(self.queue, *handlers, respect_handler_level=True)
+        queue_handler = logging.handlers.QueueHandler(self.queue)
+
+        self.logger = logging.getLogger('bot')
+        self.logger.setLevel(logging.DEBUG)
+        self.logger.addHandler(queue_handler)
+        discord_logger = logging.getLogger('discord')
+        discord_logger.setLevel(logging.INFO)
+        discord_logger.addHandler(queue_handler)
+
+        self.handlers = handlers
+        self.listener.start()
+
+    def stop(self):
+        self.listener.stop()
+        for handler in self.handlers:
+            handler.close()
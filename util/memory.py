@@ -0,0 +1,543 @@
+import asyncio
+import copy
+import datetime
+import re
+from collections import Counter
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, CollectionInvalid, DuplicateKeyError, OperationFailure, WriteError
+from pymongo.operations import DeleteMany, DeleteOne, InsertOne, ReplaceOne, UpdateMany, UpdateOne
+from pymongo.results import BulkWriteResult, DeleteResult, InsertManyResult, InsertOneResult, UpdateResult
+
+
+class MemoryClient:
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.round_trips = Counter()  # (collection, operation) -> count
+        self._databases = dict()
+
+    def __getitem__(self, name):
+        if name not in self._databases:
+            self._databases[name] = MemoryDatabase(self, name)
+        return self._databases[name]
+
+    def get_database(self, name):
+        return self[name]
+
+    @property
+    def total_round_trips(self):
+        return sum(self.round_trips.values())
+
+    def reset_round_trips(self):
+        self.round_trips.clear()
+
+    async def _round_trip(self, collection, operation):
+        self.round_trips[(collection, operation)] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        else:
+            await asyncio.sleep(0)
+
+    def close(self):
+        pass
+
+
+class MemoryDatabase:
+
+    def __init__(self, client: MemoryClient, name: str):
+        self.client = client
+        self.name = name
+        self._collections = dict()
+
+    def __getitem__(self, name):
+        if name not in self._collections:
+            self._collections[name] = MemoryCollection(self, name)
+        return self._collections[name]
+
+    def get_collection(self, name):
+        return self[name]
+
+    async def list_collection_names(self):
+        await self.client._round_trip(None, 'listCollections')
+        return [name for name, collection in self._collections.items() if collection._created]
+
+    async def create_collection(self, name, **kwargs):
+        await self.client._round_trip(name, 'create')
+        if self[name]._created:
+            raise CollectionInvalid(f'collection {name} already exists')
+        self[name]._created = True
+        return self[name]
+
+    async def command(self, command, *args, **kwargs):
+        await self.client._round_trip(None, command)
+        if command == 'ping':
+            return {'ok': 1.0}
+        if command in ('hello', 'isMaster'):
+            now = datetime.datetime.utcnow()
+            # Mongo stores dates with millisecond precision
+            return {'ok': 1.0, 'localTime': now.replace(microsecond=now.microsecond // 1000 * 1000)}
+        raise OperationFailure(f'Command {command} is not supported by the memory backend.')
+
+
+class MemoryCollection:
+
+    def __init__(self, database: MemoryDatabase, name: str):
+        self.database = database
+        self.name = name
+        self._documents = dict()  # _id -> document
+        self._indexes = {'_id_': {'key': [('_id', 1)]}}
+        self._unique = dict()  # field -> {value: _id}
+        self._created = False
+
+    async def _round_trip(self, operation):
+        await self.database.client._round_trip(self.name, operation)
+
+    # Reads
+
+    async def find_one(self, db_filter=None, *args, **kwargs):
+        await self._round_trip('find')
+        for document in self._match(db_filter or {}):
+            return copy.deepcopy(document)
+        return None
+
+    def find(self, db_filter=None, *args, **kwargs):
+        return MemoryCursor(self, db_filter or {})
+
+    async def count_documents(self, db_filter, **kwargs):
+        await self._round_trip('count')
+        return sum(1 for _ in self._match(db_filter))
+
+    async def index_information(self):
+        await self._round_trip('listIndexes')
+        return copy.deepcopy(self._indexes)
+
+    def watch(self, *args, **kwargs):
+        raise OperationFailure('Change streams are not supported by the memory backend.')
+
+    # Writes
+
+    async def insert_one(self, document, **kwargs):
+        await self._round_trip('insert')
+        return InsertOneResult(self._insert(document), True)
+
+    async def insert_many(self, documents, **kwargs):
+        await self._round_trip('insert')
+        return InsertManyResult([self._insert(document) for document in documents], True)
+
+    async def update_one(self, db_filter, update, upsert=False, **kwargs):
+        await self._round_trip('update')
+        return UpdateResult(self._update(db_filter, update, upsert, many=False), True)
+
+    async def update_many(self, db_filter, update, upsert=False, **kwargs):
+        await self._round_trip('update')
+        return UpdateResult(self._update(db_filter, update, upsert, many=True), True)
+
+    async def replace_one(self, db_filter, replacement, upsert=False, **kwargs):
+        await self._round_trip('update')
+        return UpdateResult(self._replace(db_filter, replacement, upsert), True)
+
+    async def delete_one(self, db_filter, **kwargs):
+        await self._round_trip('delete')
+        return DeleteResult({'n': self._delete(db_filter, many=False)}, True)
+
+    async def delete_many(self, db_filter, **kwargs):
+        await self._round_trip('delete')
+        return DeleteResult({'n': self._delete(db_filter, many=True)}, True)
+
+    async def find_one_and_update(self, db_filter, update, upsert=False, return_document=ReturnDocument.BEFORE,
+                                  **kwargs):
+        await self._round_trip('findAndModify')
+        before = next(self._match(db_filter), None)
+        before = copy.deepcopy(before)
+        result = self._update(db_filter, update, upsert, many=False)
+        if return_document == ReturnDocument.BEFORE:
+            return before
+        _id = result['upserted'] if 'upserted' in result else before['_id'] if before else None
+        return copy.deepcopy(self._documents.get(_id)) if _id is not None else None
+
+    async def bulk_write(self, requests, ordered=True, **kwargs):
+        await self._round_trip('bulkWrite')
+        result = {
+            'nInserted': 0,
+            'nUpserted': 0,
+            'nMatched': 0,
+            'nModified': 0,
+            'nRemoved': 0,
+            'upserted': [],
+            'writeErrors': []
+        }
+        for index, request in enumerate(requests):
+            try:
+                # pymongo keeps the request arguments in private attributes
+                if isinstance(request, InsertOne):
+                    self._insert(request._doc)
+                    result['nInserted'] += 1
+                    continue
+                if isinstance(request, (DeleteOne, DeleteMany)):
+                    result['nRemoved'] += self._delete(request._filter, many=isinstance(request, DeleteMany))
+                    continue
+                if isinstance(request, ReplaceOne):
+                    update_result = self._replace(request._filter, request._doc, request._upsert)
+                elif isinstance(request, (UpdateOne, UpdateMany)):
+                    update_result = self._update(request._filter, request._doc, request._upsert,
+                                                 many=isinstance(request, UpdateMany))
+                else:
+                    raise TypeError(f'{request!r} is not a valid request')
+                if 'upserted' in update_result:
+                    result['nUpserted'] += 1
+                    result['upserted'].append({'index': index, '_id': update_result['upserted']})
+                else:
+                    result['nMatched'] += update_result['n']
+                    result['nModified'] += update_result['nModified']
+            except WriteError as ex:
+                # Like the server, an unordered write goes on with the next request
+                result['writeErrors'].append({'index': index, 'code': ex.code, 'errmsg': str(ex), 'op': request})
+                if ordered:
+                    break
+        if result['writeErrors']:
+            raise BulkWriteError(result)
+        return BulkWriteResult(result, True)
+
+    # Collection management
+
+    async def create_indexes(self, indexes, **kwargs):
+        await self._round_trip('createIndexes')
+        names = list()
+        for index in indexes:
+            document = index.document
+            key = list(document['key'].items())
+            if document.get('unique') and len(key) == 1:
+                field = key[0][0]
+                values = dict()
+                for document_ in self._documents.values():
+                    value = _get_field(document_, field)
+                    if value in values:
+                        raise DuplicateKeyError(f'E11000 duplicate key error collection: {self.name} index: '
+                                                f'{document["name"]}')
+                    values[value] = document_['_id']
+                self._unique[field] = values
+            self._indexes[document['name']] = {'key': key, **({'unique': True} if document.get('unique') else {})}
+            names.append(document['name'])
+        self._created = True
+        return names
+
+    async def drop(self, **kwargs):
+        await self._round_trip('drop')
+        self._reset()
+
+    async def rename(self, new_name, dropTarget=False, **kwargs):
+        await self._round_trip('renameCollection')
+        collections = self.database._collections
+        if collections.get(new_name) is not None and collections[new_name]._created and not dropTarget:
+            raise OperationFailure('target namespace exists')
+        target = MemoryCollection(self.database, new_name)
+        target._documents, target._indexes, target._unique, target._created = \
+            self._documents, self._indexes, self._unique, True
+        collections[new_name] = target
+        self._reset()
+
+    def _reset(self):
+        self._documents = dict()
+        self._indexes = {'_id_': {'key': [('_id', 1)]}}
+        self._unique = dict()
+        self._created = False
+
+    # Internals
+
+    def _match(self, db_filter):
+        # Equality lookups on a unique index skip the collection scan
+        if len(db_filter) == 1:
+            field, value = next(iter(db_filter.items()))
+            if field == '_id' and not isinstance(value, dict):
+                document = self._documents.get(value)
+                if document is not None:
+                    yield document
+                return
+            if field in self._unique and not isinstance(value, dict) and value is not None:
+                _id = self._unique[field].get(value)
+                if _id is not None:
+                    yield self._documents[_id]
+                return
+        for document in list(self._documents.values()):
+            if _matches(document, db_filter):
+                yield document
+
+    def _check_unique(self, document, _id):
+        for field, values in self._unique.items():
+            value = _get_field(document, field)
+            if value in values and values[value] != _id:
+                raise DuplicateKeyError(f'E11000 duplicate key error collection: {self.name} dup key: '
+                                        f'{{{field}: {value!r}}}')
+
+    def _store(self, document):
+        old = self._documents.get(document['_id'])
+        self._check_unique(document, document['_id'])
+        for field, values in self._unique.items():
+            if old is not None:
+                values.pop(_get_field(old, field), None)
+            values[_get_field(document, field)] = document['_id']
+        self._documents[document['_id']] = document
+        self._created = True
+
+    def _insert(self, document):
+        if '_id' not in document:
+            document['_id'] = ObjectId()
+        if document['_id'] in self._documents:
+            raise DuplicateKeyError(f'E11000 duplicate key error collection: {self.name} index: _id_')
+        self._store(copy.deepcopy(document))
+        return document['_id']
+
+    def _update(self, db_filter, update, upsert, many):
+        matched = list(self._match(db_filter))
+        if not many:
+            matched = matched[:1]
+        if not matched:
+            if not upsert:
+                return {'n': 0, 'nModified': 0}
+            document = {key: copy.deepcopy(value) for key, value in db_filter.items()
+                        if not key.startswith('$') and not isinstance(value, dict)}
+            document.setdefault('_id', ObjectId())
+            _apply_update(document, update, insert=True)
+            self._store(document)
+            return {'n': 1, 'nModified': 0, 'upserted': document['_id']}
+        modified = 0
+        for document in matched:
+            updated = copy.deepcopy(document)
+            _apply_update(updated, update, insert=False)
+            if updated != document:
+                self._store(updated)
+                modified += 1
+        return {'n': len(matched), 'nModified': modified}
+
+    def _replace(self, db_filter, replacement, upsert):
+        document = next(self._match(db_filter), None)
+        replacement = copy.deepcopy(replacement)
+        if document is None:
+            if not upsert:
+                return {'n': 0, 'nModified': 0}
+            replacement.setdefault('_id', db_filter.get('_id', ObjectId()))
+            self._store(replacement)
+            return {'n': 1, 'nModified': 0, 'upserted': replacement['_id']}
+        replacement['_id'] = document['_id']
+        self._store(replacement)
+        return {'n': 1, 'nModified': int(replacement != document)}
+
+    def _delete(self, db_filter, many):
+        matched = list(self._match(db_filter))
+        if not many:
+            matched = matched[:1]
+        for document in matched:
+            for field, values in self._unique.items():
+                values.pop(_get_field(document, field), None)
+            del self._documents[document['_id']]
+        return len(matched)
+
+
+class MemoryCursor:
+
+    def __init__(self, collection: MemoryCollection, db_filter):
+        self._collection = collection
+        self._filter = db_filter
+        self._sort = list()
+        self._batch_size = 101
+        self._limit = 0
+        self._results = None
+
+    def sort(self, key, direction=1):
+        self._sort = [(key, direction)] if isinstance(key, str) else list(key)
+        return self
+
+    def batch_size(self, batch_size):
+        self._batch_size = batch_size or 101
+        return self
+
+    def limit(self, limit):
+        self._limit = limit
+        return self
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._results is None:
+            self._results = self._execute()
+            self._index = 0
+        if self._index >= len(self._results):
+            raise StopAsyncIteration
+        if self._index % self._batch_size == 0:
+            await self._collection._round_trip('find' if self._index == 0 else 'getMore')
+        document = self._results[self._index]
+        self._index += 1
+        return document
+
+    async def to_list(self, length=None):
+        documents = list()
+        async for document in self:
+            documents.append(document)
+            if length and len(documents) >= length:
+                break
+        return documents
+
+    def _execute(self):
+        results = [copy.deepcopy(document) for document in self._collection._match(self._filter)]
+        for key, direction in reversed(self._sort):
+            results.sort(key=lambda document: _sort_key(_get_field(document, key)), reverse=direction < 0)
+        if self._limit:
+            results = results[:self._limit]
+        return results
+
+
+def _sort_key(value):
+    # Mongo orders None before numbers before strings before everything else
+    if value is None:
+        return 0, 0
+    if isinstance(value, (int, float)):
+        return 1, value
+    if isinstance(value, str):
+        return 2, value
+    return 3, str(value)
+
+
+def _get_field(document, field):
+    value = document
+    for part in field.split('.'):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value
+
+
+def _has_field(document, field):
+    value = document
+    for part in field.split('.'):
+        if not isinstance(value, dict) or part not in value:
+            return False
+        value = value[part]
+    return True
+
+
+def _compare(value, operator, argument):
+    if operator == '$eq':
+        return value == argument
+    if operator == '$ne':
+        return value != argument
+    if operator == '$in':
+        return value in argument
+    if operator == '$nin':
+        return value not in argument
+    if operator == '$regex':
+        return isinstance(value, str) and re.search(argument, value) is not None
+    if value is None:
+        return False
+    try:
+        if operator == '$gt':
+            return value > argument
+        if operator == '$gte':
+            return value >= argument
+        if operator == '$lt':
+            return value < argument
+        if operator == '$lte':
+            return value <= argument
+    except TypeError:
+        return False
+    raise OperationFailure(f'Query operator {operator} is not supported by the memory backend.')
+
+
+def _matches(document, db_filter):
+    for field, condition in db_filter.items():
+        if field == '$and':
+            if not all(_matches(document, sub_filter) for sub_filter in condition):
+                return False
+            continue
+        if field == '$or':
+            if not any(_matches(document, sub_filter) for sub_filter in condition):
+                return False
+            continue
+        value = _get_field(document, field)
+        if isinstance(condition, dict) and condition and all(key.startswith('$') for key in condition):
+            for operator, argument in condition.items():
+                if operator == '$exists':
+                    if _has_field(document, field) != bool(argument):
+                        return False
+                elif operator == '$options':
+                    continue
+                elif operator == '$regex' and 'i' in condition.get('$options', ''):
+                    if not isinstance(value, str) or re.search(argument, value, re.IGNORECASE) is None:
+                        return False
+                elif not _compare(value, operator, argument):
+                    return False
+        elif value != condition:
+            return False
+    return True
+
+
+def _set_field(document, field, value):
+    parts = field.split('.')
+    for part in parts[:-1]:
+        document = document.setdefault(part, dict())
+    document[parts[-1]] = value
+
+
+def _unset_field(document, field):
+    parts = field.split('.')
+    for part in parts[:-1]:
+        document = document.get(part)
+        if not isinstance(document, dict):
+            return
+    document.pop(parts[-1], None)
+
+
+def _check_conflicts(update):
+    # Like the server, an update may not touch the same path, or a path and its parent, with two operators
+    paths = list()
+    for operator, fields in update.items():
+        for field in fields:
+            for other in paths:
+                if field == other or field.startswith(f'{other}.') or other.startswith(f'{field}.'):
+                    raise WriteError(f"Updating the path '{field}' would create a conflict at '{other}'", 40)
+            paths.append(field)
+
+
+def _apply_update(document, update, insert):
+    if not any(key.startswith('$') for key in update):
+        raise ValueError('update only works with $ operators')
+    _check_conflicts(update)
+    for operator, fields in update.items():
+        if operator == '$setOnInsert':
+            if insert:
+                for field, value in fields.items():
+                    _set_field(document, field, copy.deepcopy(value))
+        elif operator == '$set':
+            for field, value in fields.items():
+                _set_field(document, field, copy.deepcopy(value))
+        elif operator == '$unset':
+            for field in fields:
+                _unset_field(document, field)
+        elif operator == '$inc':
+            for field, amount in fields.items():
+                current = _get_field(document, field)
+                if current is not None and not isinstance(current, (int, float)):
+                    raise WriteError(f"Cannot apply $inc to a value of non-numeric type. '{field}' has the type "
+                                     f"{type(current).__name__}", 14)
+                _set_field(document, field, (current or 0) + amount)
+        elif operator in ('$max', '$min'):
+            for field, value in fields.items():
+                current = _get_field(document, field)
+                if current is None or (value > current if operator == '$max' else value < current):
+                    _set_field(document, field, value)
+        elif operator == '$push':
+            for field, value in fields.items():
+                values = value['$each'] if isinstance(value, dict) and '$each' in value else [value]
+                current = _get_field(document, field)
+                if current is not None and not isinstance(current, list):
+                    raise WriteError(f"The field '{field}' must be an array but is of type {type(current).__name__}",
+                                     2)
+                _set_field(document, field, (current or list()) + copy.deepcopy(values))
+        elif operator == '$currentDate':
+            now = datetime.datetime.utcnow()
+            for field in fields:
+                _set_field(document, field, now.replace(microsecond=now.microsecond // 1000 * 1000))
+        else:
+            raise OperationFailure(f'Update operator {operator} is not supported by the memory backend.')
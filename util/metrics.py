@@ -0,0 +1,224 @@
+import asyncio
+import bisect
+import math
+import os
+import threading
+
+
+class Counter:
+
+    type = 'counter'
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class Gauge:
+
+    type = 'gauge'
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def set(self, value):
+        self.value = value
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+
+class Histogram:
+
+    type = 'histogram'
+    default_buckets = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, buckets=None):
+        self.buckets = tuple(buckets or self.default_buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # the last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def quantile(self, quantile):
+        # Upper bound of the bucket the quantile falls into
+        if not self.count:
+            return 0.0
+        rank = quantile * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return self.buckets[index] if index < len(self.buckets) else float('inf')
+        return float('inf')
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+    @property
+    def mean(self):
+        return self.sum / self.count if self.count else 0.0
+
+
+class MetricsRegistry:
+
+    def __init__(self):
+        self._metrics = dict()  # name -> {labels: metric}
+        self._help = dict()
+        self._collectors = list()
+        self._lock = threading.Lock()
+
+    def _get(self, metric_class, name, description, labels, **kwargs):
+        key = tuple(sorted(labels.items()))
+        metrics = self._metrics.get(name)
+        if metrics is not None:
+            metric = metrics.get(key)
+            if metric is not None:
+                return metric
+        with self._lock:
+            metrics = self._metrics.setdefault(name, dict())
+            if key not in metrics:
+                metrics[key] = metric_class(**kwargs)
+            if description:
+                self._help[name] = description
+            return metrics[key]
+
+    def counter(self, name, description=None, **labels) -> Counter:
+        return self._get(Counter, name, description, labels)
+
+    def gauge(self, name, description=None, **labels) -> Gauge:
+        return self._get(Gauge, name, description, labels)
+
+    def histogram(self, name, description=None, buckets=None, **labels) -> Histogram:
+        return self._get(Histogram, name, description, labels, buckets=buckets)
+
+    def add_collector(self, collector):
+        # Collectors refresh derived metrics right before an export
+        self._collectors.append(collector)
+
+    def remove(self, name):
+        with self._lock:
+            self._metrics.pop(name, None)
+
+    def collect(self, name=None):
+        with self._lock:
+            names = [name] if name else list(self._metrics)
+            return [(metric_name, dict(labels), metric) for metric_name in names
+                    for labels, metric in list(self._metrics.get(metric_name, dict()).items())]
+
+    def export(self):
+        for collector in self._collectors:
+            collector()
+        lines = list()
+        with self._lock:
+            families = [(name, self._help.get(name), list(metrics.items())) for name, metrics in self._metrics.items()]
+        for name, description, metrics in families:
+            if not metrics:
+                continue
+            if description:
+                lines.append(f'# HELP {name} {escape_help(description)}')
+            lines.append(f'# TYPE {name} {metrics[0][1].type}')
+            for labels, metric in metrics:
+                if metric.type != 'histogram':
+                    lines.append(f'{name}{format_labels(labels)} {format_value(metric.value)}')
+                    continue
+                counts, total, count = metric.snapshot()
+                cumulative = 0
+                for bound, bucket_count in zip(metric.buckets + (math.inf,), counts):
+                    cumulative += bucket_count
+                    lines.append(f'{name}_bucket{format_labels(labels + (("le", format_value(bound)),))} {cumulative}')
+                lines.append(f'{name}_sum{format_labels(labels)} {format_value(total)}')
+                lines.append(f'{name}_count{format_labels(labels)} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+def escape_help(text):
+    return text.replace('\\', '\\\\').replace('\n', '\\n')
+
+
+def escape_label(value):
+    return escape_help(str(value)).replace('"', '\\"')
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{escape_label(value)}"' for key, value in labels) + '}'
+
+
+def format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if value == -math.inf:
+        return '-Inf'
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class MetricsExporter:
+
+    def __init__(self, registry, path=None, host='127.0.0.1', port=None, interval=15.0):
+        self.registry = registry
+        self.path = path
+        self.host = host
+        self.port = port
+        self.interval = interval
+        self._server = None
+        self._task = None
+
+    async def start(self):
+        if self.port:
+            self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        if self.path:
+            self._task = asyncio.get_event_loop().create_task(self._write_periodically())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+
+    def write(self, text=None):
+        # Scrapers reading the file never see a partial export
+        temp_path = f'{self.path}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            file.write(self.registry.export() if text is None else text)
+        os.replace(temp_path, self.path)
+
+    async def _write_periodically(self):
+        loop = asyncio.get_event_loop()
+        while True:
+            # Collectors run on the event loop, only the file IO happens in the executor
+            await loop.run_in_executor(None, self.write, self.registry.export())
+            await asyncio.sleep(self.interval)
+
+    async def _handle(self, reader, writer):
+        # A minimal HTTP endpoint, every request is answered with the current export
+        try:
+            while (await asyncio.wait_for(reader.readline(), 5)).strip():
+                pass
+            body = self.registry.export().encode('utf-8')
+            writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\n'
+                         b'Content-Length: ' + str(len(body)).encode() + b'\r\nConnection: close\r\n\r\n' + body)
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
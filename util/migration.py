@@ -0,0 +1,82 @@
+from pymongo import ASCENDING, UpdateOne
+
+
+class CollectionMigration:
+
+    def __init__(self, database, name: str, source: str, target: str, transform=None, batch_size=500):
+        self._database = database
+        self.name = name
+        self.source = source
+        self.target = target
+        self.staging = f'{target}_{name}_staging'
+        self.batch_size = batch_size
+
+        self._transform = transform or self._copy
+        self._checkpoints = database.get_collection('Migrations')
+
+    def _copy(self, document):
+        # Written as an update, so the copy gets the timestamp incremental snapshots filter on
+        fields = {key: value for key, value in document.items() if key != '_id'}
+        return UpdateOne({'_id': document['_id']}, self._database.touch({'$set': fields} if fields else {}),
+                         upsert=True)
+
+    async def run(self, prepare=None):
+        logger = self._database._bot.logger
+        checkpoint = await self._checkpoints.find_one({'name': self.name})
+        staging = self._database.get_collection(self.staging)
+
+        if checkpoint is None:
+            await staging.drop()
+            # Created up front so an empty source still replaces the target, a missing staging
+            # collection then always means the rename already happened
+            await self._database.create_collection(self.staging)
+            if prepare:
+                await prepare(staging)
+            checkpoint = {
+                'name': self.name,
+                'state': 'copying',
+                'last_id': None,
+                'count': 0
+            }
+            await self._checkpoints.insert_one(checkpoint)
+        else:
+            logger.info(f'[DATABASE] Resuming migration {self.name} after {checkpoint["count"]} documents...')
+
+        if checkpoint['state'] == 'copying':
+            await self._copy_documents(checkpoint, staging)
+            await self._save_checkpoint(checkpoint, state='renaming')
+
+        # The rename may already have happened if the last run died right after it
+        if self.staging in await self._database.list_collection_names():
+            await staging.rename(self.target, dropTarget=True)
+        await self._checkpoints.delete_one({'name': self.name})
+        logger.info(f'[DATABASE] Migration {self.name} finished after {checkpoint["count"]} documents.')
+        return checkpoint['count']
+
+    async def _copy_documents(self, checkpoint, staging):
+        db_filter = {'_id': {'$gt': checkpoint['last_id']}} if checkpoint['last_id'] is not None else {}
+        cursor = self._database.get_collection(self.source).find(db_filter)\
+            .sort('_id', ASCENDING).batch_size(self.batch_size)
+
+        operations = list()
+        last_id = None
+        async for document in cursor:
+            operation = self._transform(document)
+            last_id = document['_id']
+            if operation is not None:
+                operations.append(operation)
+            if len(operations) >= self.batch_size:
+                await self._write_batch(checkpoint, staging, operations, last_id)
+                operations = list()
+        if last_id is not None:
+            await self._write_batch(checkpoint, staging, operations, last_id)
+
+    async def _write_batch(self, checkpoint, staging, operations, last_id):
+        # Every operation is an idempotent upsert, so a batch repeated after a crash does no harm
+        if operations:
+            await staging.bulk_write(operations, ordered=True)
+        await self._save_checkpoint(checkpoint, last_id=last_id, count=checkpoint['count'] + len(operations))
+
+    async def _save_checkpoint(self, checkpoint, **values):
+        checkpoint.update(values)
+        await self._checkpoints.update_one({'name': self.name}, {'$set': values})
@@ -0,0 +1,114 @@
+import time
+from collections import deque
+
+from pymongo import monitoring
+
+
+class CommandMonitor(monitoring.CommandListener):
+
+    def __init__(self, bot, slow_threshold=0.1, max_slow_queries=100):
+        self._bot = bot
+        self.slow_threshold = slow_threshold
+        self.slow_queries = deque(maxlen=max_slow_queries)
+        self._pending = dict()  # (connection_id, request_id) -> (collection, filter)
+
+    @staticmethod
+    def _filter(command, command_name):
+        if command_name in ('update', 'delete'):
+            statements = command.get('updates') or command.get('deletes') or []
+            return [statement.get('q') for statement in statements[:3]]
+        for key in ('filter', 'query', 'pipeline'):
+            if key in command:
+                return command[key]
+        return None
+
+    def started(self, event):
+        # getMore carries the cursor id under its command name, the collection is a separate field
+        key = 'collection' if event.command_name == 'getMore' else event.command_name
+        collection = event.command.get(key)
+        collection = collection if isinstance(collection, str) else None
+        self._pending[(event.connection_id, event.request_id)] = \
+            (collection, self._filter(event.command, event.command_name))
+
+    def _finish(self, event, failed):
+        collection, db_filter = self._pending.pop((event.connection_id, event.request_id), (None, None))
+        seconds = event.duration_micros / 1000000
+        labels = {
+            'collection': collection or '-',
+            'command': event.command_name
+        }
+        self._bot.metrics.histogram('mongo_command_seconds', 'Latency of Mongo commands', **labels).observe(seconds)
+        if failed:
+            self._bot.metrics.counter('mongo_command_failures_total', 'Failed Mongo commands', **labels).inc()
+        if seconds < self.slow_threshold:
+            return
+        self.slow_queries.append({
+            'time': time.time(),
+            'collection': collection,
+            'command': event.command_name,
+            'filter': db_filter,
+            'seconds': seconds,
+            'failed': failed
+        })
+        # pymongo calls listeners from the motor worker threads, logging is thread safe
+        self._bot.logger.warning(f'[DATABASE] Slow {event.command_name} on {collection} took {seconds * 1000:.1f}ms: '
+                                 f'{str(db_filter)[:500]}')
+
+    def succeeded(self, event):
+        self._finish(event, False)
+
+    def failed(self, event):
+        self._finish(event, True)
+
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+
+    def __init__(self, bot):
+        self._bot = bot
+        self.max_size = dict()  # address -> maxPoolSize
+
+    def _gauge(self, name, address):
+        return self._bot.metrics.gauge(name, server=f'{address[0]}:{address[1]}')
+
+    def saturation(self):
+        saturation = dict()
+        for address, max_size in self.max_size.items():
+            checked_out = self._gauge('mongo_pool_checked_out', address).value
+            saturation[f'{address[0]}:{address[1]}'] = checked_out / max_size if max_size else 0.0
+        return saturation
+
+    def pool_created(self, event):
+        self.max_size[event.address] = event.options.get('maxPoolSize', 100)
+        self._gauge('mongo_pool_max_size', event.address).set(self.max_size[event.address])
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self._bot.logger.warning(f'[DATABASE] Connection pool for {event.address} was cleared!')
+
+    def pool_closed(self, event):
+        self.max_size.pop(event.address, None)
+
+    def connection_created(self, event):
+        self._gauge('mongo_pool_connections', event.address).inc()
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._gauge('mongo_pool_connections', event.address).dec()
+
+    def connection_check_out_started(self, event):
+        self._gauge('mongo_pool_waiting', event.address).inc()
+
+    def connection_check_out_failed(self, event):
+        self._gauge('mongo_pool_waiting', event.address).dec()
+        self._bot.metrics.counter('mongo_pool_checkout_failures_total', reason=str(event.reason)).inc()
+
+    def connection_checked_out(self, event):
+        self._gauge('mongo_pool_waiting', event.address).dec()
+        self._gauge('mongo_pool_checked_out', event.address).inc()
+
+    def connection_checked_in(self, event):
+        self._gauge('mongo_pool_checked_out', event.address).dec()
@@ -0,0 +1,140 @@
+import asyncio
+import datetime
+import hashlib
+import re
+from collections import OrderedDict
+
+import discord
+
+from util.cache import LRUCache
+
+frame_regex = re.compile(r'^\s*File "(?P<file>.+)", line (?P<line>\d+), in (?P<function>.+)$', re.MULTILINE)
+
+
+def fingerprint(text: str):
+    # Repeats of an error share their frames and exception type, the message may contain ids and is left out
+    frames = frame_regex.findall(text)
+    lines = text.strip().splitlines()
+    error = lines[-1].split(':', 1)[0] if lines else ''
+    key = '\n'.join(f'{file}:{line}:{function}' for file, line, function in frames) + f'\n{error}'
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()[:12]
+
+
+class Incident:
+
+    __slots__ = ('fingerprint', 'error', 'location', 'traceback', 'count', 'reported', 'first_seen', 'last_seen')
+
+    def __init__(self, fingerprint, text):
+        frames = frame_regex.findall(text)
+        lines = text.strip().splitlines()
+        self.fingerprint = fingerprint
+        self.error = lines[-1] if lines else 'Unknown error'
+        self.location = f'{frames[-1][0]}:{frames[-1][1]} in {frames[-1][2]}' if frames else 'unknown'
+        self.traceback = text
+        self.count = 0
+        self.reported = 0  # count at the time of the last summary
+        self.first_seen = None
+        self.last_seen = None
+
+    def record(self, now):
+        if self.first_seen is None:
+            self.first_seen = now
+        self.last_seen = now
+        self.count += 1
+
+
+class ExceptionReporter:
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.incidents = LRUCache(max_size=1024)  # fingerprint -> Incident
+        self._pending = OrderedDict()  # fingerprint -> Incident, waiting for the next summary
+        self._flush = asyncio.Event()
+        self._task = None
+
+        self._errors = bot.metrics.counter('exceptions_total', 'Reported exceptions')
+        self._dropped = bot.metrics.counter('exceptions_dropped_total',
+                                            'New exceptions dropped because too many were waiting for a summary')
+        self._summaries = bot.metrics.counter('exception_summaries_total', 'Exception summaries sent')
+
+    @property
+    def config(self):
+        return self.bot.cfg.reporting
+
+    def report(self, text: str):
+        # Only bookkeeping happens here, summaries are sent by a single task at most once per window
+        key = fingerprint(text)
+        incident = self.incidents.get(key)
+        if incident is None:
+            incident = Incident(key, text)
+            self.incidents.set(key, incident)
+        incident.record(datetime.datetime.utcnow())
+        self._errors.inc()
+
+        if key not in self._pending:
+            if len(self._pending) >= self.config.max_pending:
+                self._dropped.inc()
+                return
+            # The traceback is logged once per summary window instead of once per repeat
+            self.bot.logger.error(f'[ERROR] {incident.error} ({key})\n{text.rstrip()}')
+            self._pending[key] = incident
+        if self._task is None or self._task.done():
+            self._task = self.bot.loop.create_task(self._work())
+
+    async def flush(self):
+        if self._pending and (self._task is None or self._task.done()):
+            self._task = self.bot.loop.create_task(self._work())
+        if self._task is not None and not self._task.done():
+            self._flush.set()
+            await self._task
+
+    async def _work(self):
+        while self._pending:
+            # Everything reported during the window ends up in one summary, after a flush they are sent right away
+            if not self._flush.is_set():
+                try:
+                    await asyncio.wait_for(self._flush.wait(), self.config.window)
+                except asyncio.TimeoutError:
+                    pass
+            pending, self._pending = list(self._pending.values()), OrderedDict()
+            try:
+                await self._send(pending)
+            except Exception:
+                self.bot.logger.exception('[ERROR] Failed to send an exception summary!')
+        # Incidents reported while sending were picked up by the loop, the next ones wait for a window again
+        self._flush.clear()
+
+    async def _send(self, incidents):
+        channel = await self.bot.utils.channel.errors()
+        if channel is None:
+            return
+        shown = incidents[:min(self.config.max_fields, 25)]
+        # Embeds are limited to 6000 characters, every field gets an equal share
+        budget = min(1024, 5000 // len(shown))
+
+        summary_message = discord.Embed()
+        summary_message.colour = self.bot.utils.color.fail()
+        summary_message.set_author(name='Exceptions')
+        summary_message.description = f'**{sum(incident.count - incident.reported for incident in incidents)}** ' \
+                                      f'exceptions of **{len(incidents)}** kinds in the last ' \
+                                      f'{self.config.window:.0f} seconds.'
+        for incident in shown:
+            details = f'`{incident.fingerprint}` at `{incident.location}`\n' \
+                      f'**{incident.count - incident.reported}x** since the last summary, {incident.count}x total\n' \
+                      f'First seen {incident.first_seen:%Y-%m-%d %H:%M:%S}, ' \
+                      f'last seen {incident.last_seen:%Y-%m-%d %H:%M:%S} UTC\n'
+            length = budget - len(details) - 6
+            if length > 0:
+                details += f'```{incident.traceback.strip()[-length:]}```'
+            summary_message.add_field(name=incident.error[:256], value=details[:budget], inline=False)
+        if len(incidents) > len(shown):
+            summary_message.set_footer(text=f'{len(incidents) - len(shown)} more kinds are only in the log.')
+
+        for incident in incidents:
+            incident.reported = incident.count
+        try:
+            await channel.send(embed=summary_message)
+        except discord.HTTPException:
+            self.bot.logger.exception('[ERROR] Discord rejected an exception summary!')
+        else:
+            self._summaries.inc()
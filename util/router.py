@@ -0,0 +1,196 @@
+import asyncio
+import math
+
+
+class TimerHandle:
+
+    __slots__ = ('slot', 'rounds', 'callback')
+
+    def __init__(self, slot, rounds, callback):
+        self.slot = slot
+        self.rounds = rounds
+        self.callback = callback
+
+
+class TimerWheel:
+
+    def __init__(self, resolution=0.5, size=512):
+        self.resolution = resolution
+        self._slots = [set() for _ in range(size)]
+        self._cursor = 0
+        self._timers = 0
+        self._task = None
+
+    def __len__(self):
+        return self._timers
+
+    def schedule(self, delay, callback):
+        ticks = max(1, math.ceil(delay / self.resolution))
+        handle = TimerHandle((self._cursor + ticks) % len(self._slots), (ticks - 1) // len(self._slots), callback)
+        self._slots[handle.slot].add(handle)
+        self._timers += 1
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_event_loop().create_task(self._run())
+        return handle
+
+    def cancel(self, handle):
+        slot = self._slots[handle.slot]
+        if handle in slot:
+            slot.remove(handle)
+            self._timers -= 1
+
+    async def _run(self):
+        loop = asyncio.get_event_loop()
+        next_tick = loop.time()
+        while self._timers:
+            # Sleep towards absolute tick times so the wheel does not drift
+            next_tick += self.resolution
+            await asyncio.sleep(max(0.0, next_tick - loop.time()))
+            self._cursor = (self._cursor + 1) % len(self._slots)
+            expired = list()
+            for handle in self._slots[self._cursor]:
+                if handle.rounds:
+                    handle.rounds -= 1
+                else:
+                    expired.append(handle)
+            for handle in expired:
+                self.cancel(handle)
+                handle.callback()
+
+
+class Waiter:
+
+    __slots__ = ('future', 'checks')
+
+    def __init__(self, future, checks):
+        self.future = future
+        self.checks = checks  # event -> check
+
+
+class SelectionRouter:
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.timers = TimerWheel()
+        self._waiters = {
+            'reaction_add': dict(),  # (channel_id, message_id, user_id) -> [Waiter]
+            'message': dict()  # (channel_id, user_id) -> [Waiter]
+        }
+        self._subscribers = dict()  # (channel_id, message_id, user_id) -> [callback(payload, added)]
+        self._deletions = dict()  # (channel_id, message_id) -> [callback()]
+
+        bot.add_listener(self._on_reaction_add, 'on_reaction_add')
+        bot.add_listener(self._on_message, 'on_message')
+        bot.add_listener(self._on_raw_reaction_add, 'on_raw_reaction_add')
+        bot.add_listener(self._on_raw_reaction_remove, 'on_raw_reaction_remove')
+        bot.add_listener(self._on_raw_message_delete, 'on_raw_message_delete')
+        bot.add_listener(self._on_raw_bulk_message_delete, 'on_raw_bulk_message_delete')
+
+    @classmethod
+    def of(cls, bot):
+        router = getattr(bot, 'selection_router', None)
+        if router is None:
+            router = bot.selection_router = cls(bot)
+        return router
+
+    @staticmethod
+    def reaction_key(message, user):
+        return message.channel.id, message.id, user.id
+
+    @staticmethod
+    def message_key(channel, user):
+        return channel.id, user.id
+
+    @staticmethod
+    def _subscribe(subscribers, key, callback):
+        subscribers.setdefault(key, list()).append(callback)
+
+        def unsubscribe():
+            callbacks = subscribers.get(key)
+            if callbacks and callback in callbacks:
+                callbacks.remove(callback)
+                if not callbacks:
+                    del subscribers[key]
+
+        return unsubscribe
+
+    def subscribe(self, key, callback):
+        return self._subscribe(self._subscribers, key, callback)
+
+    def subscribe_delete(self, message, callback):
+        return self._subscribe(self._deletions, (message.channel.id, message.id), callback)
+
+    async def wait_for(self, timeout, **events):
+        # events: event name -> (key, check or None); resolves with the first matching event like bot.wait_for
+        future = asyncio.get_event_loop().create_future()
+        waiter = Waiter(future, {event: check for event, (_, check) in events.items()})
+        for event, (key, _) in events.items():
+            self._waiters[event].setdefault(key, list()).append(waiter)
+
+        def expire():
+            if not future.done():
+                future.set_exception(asyncio.TimeoutError())
+
+        timer = self.timers.schedule(timeout, expire)
+        try:
+            return await future
+        finally:
+            self.timers.cancel(timer)
+            for event, (key, _) in events.items():
+                waiters = self._waiters[event].get(key)
+                if waiters is None:
+                    continue
+                if waiter in waiters:
+                    waiters.remove(waiter)
+                if not waiters:
+                    del self._waiters[event][key]
+
+    def _dispatch(self, event, key, *args):
+        waiters = self._waiters[event].get(key)
+        if not waiters:
+            return
+        for waiter in list(waiters):
+            if waiter.future.done():
+                continue
+            check = waiter.checks[event]
+            try:
+                if check is not None and not check(*args):
+                    continue
+            except Exception as ex:
+                waiter.future.set_exception(ex)
+                continue
+            waiter.future.set_result(args[0] if len(args) == 1 else args)
+            return
+
+    async def _on_reaction_add(self, reaction, user):
+        self._dispatch('reaction_add', self.reaction_key(reaction.message, user), reaction, user)
+
+    async def _on_message(self, message):
+        self._dispatch('message', self.message_key(message.channel, message.author), message)
+
+    def _notify(self, payload, added):
+        callbacks = self._subscribers.get((payload.channel_id, payload.message_id, payload.user_id))
+        if not callbacks:
+            return
+        for callback in list(callbacks):
+            callback(payload, added)
+
+    async def _on_raw_reaction_add(self, payload):
+        self._notify(payload, True)
+
+    async def _on_raw_reaction_remove(self, payload):
+        self._notify(payload, False)
+
+    def _notify_delete(self, channel_id, message_id):
+        callbacks = self._deletions.pop((channel_id, message_id), None)
+        if not callbacks:
+            return
+        for callback in callbacks:
+            callback()
+
+    async def _on_raw_message_delete(self, payload):
+        self._notify_delete(payload.channel_id, payload.message_id)
+
+    async def _on_raw_bulk_message_delete(self, payload):
+        for message_id in payload.message_ids:
+            self._notify_delete(payload.channel_id, message_id)
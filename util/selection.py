@@ -1,281 +1,261 @@
 import asyncio
+import copy
+import functools
 import re
 from enum import Enum
 
 import discord
 
+from util.editor import MessageEditor
+from util.router import SelectionRouter
+
 
 class SelectionBuildException(Exception):
     pass
 
 
+URL_REGEX = re.compile(
+    r'^(?:http|ftp)s?://'  # http:// or https://
+    r'(?:(?:[A-Z0-9](?:[A-Z0-9-]{0,61}[A-Z0-9])?\.)+(?:[A-Z]{2,6}\.?|[A-Z0-9-]{2,}\.?)|'  # domain...
+    r'localhost|'  # localhost...
+    r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})'  # ...or ip
+    r'(?::\d+)?'  # optional port
+    r'(?:/?|[/?]\S+)$', re.IGNORECASE)
+
+
+@functools.lru_cache(maxsize=1024)
+def check_url(url):
+    return isinstance(url, str) and URL_REGEX.match(url) is not None
+
+
 class SelectionBase:
 
-    def __init__(self, interface, title, text, **kwargs):
-        self.interface = interface
+    def __init__(self, flow, title, text, **kwargs):
+        self.flow = flow
         self.title = title
         self.text = text
+        self.first = kwargs.get('first', False)
 
-        self.interface_reactions = [self.interface.fail_emoji] if kwargs.get('first', False) else \
-            [self.interface.back_emoji, self.interface.fail_emoji]
+        self.interface_reactions = [flow.fail_emoji] if self.first else [flow.back_emoji, flow.fail_emoji]
 
         self.footer = kwargs.get('footer_text', discord.embeds.EmptyEmbed)
         self.header_url = kwargs.get('header_url', discord.embeds.EmptyEmbed)
-        self.header_icon = kwargs.get('header_icon', self.interface.header_icon)
-        self.footer_icon = kwargs.get('footer_icon', self.interface.footer_icon)
-        self.color = kwargs.get('color', self.interface.selection_color)
-        self.fields = kwargs.get('fields', [])
+        self.header_icon = kwargs.get('header_icon', flow.header_icon)
+        self.footer_icon = kwargs.get('footer_icon', flow.footer_icon)
+        self.color = kwargs.get('color', flow.selection_color)
+        self.fields = list(kwargs.get('fields', []))
         self.thumbnail = kwargs.get('thumbnail', '')
         self.image = kwargs.get('image', '')
 
-        self.next = None
-        self.prev = None
-
         self.result_events = {}
         self.action = None
         self.load_action = False
 
+        self._template = None
+
     def add_result(self, result: str, selection_or_result, header: str, desc: str, **kwargs):
-        selection = selection_or_result.value(self.interface, header, desc, **kwargs)
+        self.flow.check_mutable()
+        selection = selection_or_result.value(self.flow, header, desc, **kwargs)
         self.result_events[result] = selection
         return selection
 
     def set_action(self, function, loading=False):
+        self.flow.check_mutable()
         self.action = function
         self.load_action = loading
 
-    def build_message(self):
-        msg = discord.Embed()
-        msg.colour = self.color
+    def next_selection(self, value):
+        return self.result_events.get(value, self.result_events.get('*', None))
 
-        msg.set_author(
-            name=self.title.get(self.interface.result()) if type(self.title) is ReplacedText else self.title,
-            url=self.header_url,
-            icon_url=self.header_icon
-        )
+    def validate(self):
+        if self.action is not None and not asyncio.iscoroutinefunction(self.action):
+            raise SelectionBuildException(f'The action of "{self.title}" has to be a coroutine function.')
+        for selection in self.result_events.values():
+            if selection.flow is not self.flow:
+                raise SelectionBuildException(f'"{self.title}" leads to a selection of another flow.')
 
-        msg.description = self.text.get(self.interface.result()) if type(self.text) is ReplacedText else self.text
-        for field in self.fields:
-            field_name = field.get('name', 'None')
-            field_value = field.get('value', 'None')
-            msg.add_field(name=field_name.get(self.interface.result()) if type(field_name) is ReplacedText else field_name,
-                          value=field_value.get(self.interface.result()) if type(field_value) is ReplacedText else field_value,
-                          inline=field.get('inline', True))
-        msg.set_footer(
-            text=self.footer.get(self.interface.result()) if type(self.footer) is ReplacedText else self.footer,
-            icon_url=self.footer_icon
-        )
+    def compile(self):
+        self._template = SelectionTemplate(self)
 
-        thumbnail_url = self.thumbnail.get(self.interface.result()) if type(self.thumbnail) is ReplacedText \
-            else self.thumbnail
-        if self.interface.check_url(thumbnail_url):
-            msg.set_thumbnail(url=thumbnail_url)
+    def build_message(self, interface):
+        if self._template is None:
+            self.compile()
+        return self._template.render(interface)
 
-        image_url = self.image.get(self.interface.result()) if type(self.image) is ReplacedText else self.image
-        if self.interface.check_url(image_url):
-            msg.set_image(url=image_url)
-
-        return msg
+    async def run(self, interface):
+        return SelectionResult(SelectionResultType.NONE)
 
-    async def run_action(self):
+    async def run_action(self, interface):
         if not self.action:
             return
         if self.load_action:
-            load_embed = discord.Embed()
-            load_embed.colour = self.interface.load_color
-            load_embed.description = self.interface.load_text
-            await self.interface.message.edit(embed=load_embed)
-        await self.action(self.interface.ctx, self.interface.result())
+            interface.edit(self.flow.load_embed)
+        await self.action(interface.ctx, interface.result())
 
 
 class ReactionSelection(SelectionBase):
 
-    def __init__(self, interface, header: str, description: str, reactions: list, **kwargs):
-        super().__init__(interface, header, description, **kwargs)
+    def __init__(self, flow, header: str, description: str, reactions: list, **kwargs):
+        super().__init__(flow, header, description, **kwargs)
+
+        if not self.first:
+            self.fields.append({'name': flow.back_hint, 'value': '\u200b' + str(flow.back_emoji)})
+        self.fields.append({'name': flow.cancel_hint, 'value': '\u200b' + str(flow.fail_emoji)})
 
-        if not kwargs.get('first', False):
-            self.fields.append({'name': self.interface.back_hint, 'value': '\u200b' + str(self.interface.back_emoji)})
-        self.fields.append({'name': self.interface.cancel_hint, 'value': '\u200b' + str(self.interface.fail_emoji)})
+        self.reactions = list(reactions)
 
-        self.reactions = reactions
+    def validate(self):
+        super().validate()
+        if not self.reactions:
+            raise SelectionBuildException(f'"{self.title}" has no reactions to select.')
+        for result in self.result_events:
+            if result != '*' and result not in self.reactions:
+                raise SelectionBuildException(f'"{self.title}" has a result for {result} which is no reaction.')
 
-    async def run(self):
-        reaction_task = self.interface.loop.create_task(self._add_reactions())
+    async def run(self, interface):
+        interface.show_reactions(self.interface_reactions + self.reactions)
         try:
-            reaction, user = await self.interface.bot.wait_for('reaction_add', timeout=self.interface.timeout,
-                                                               check=self._check)
+            reaction, user = await interface.wait_for_reaction(self._check)
         except asyncio.TimeoutError:
-            reaction_task.cancel()
-            await self.interface.message.clear_reactions()
             return SelectionResult(SelectionResultType.FAIL, 0)
 
-        reaction_task.cancel()
-        await self.interface.message.clear_reactions()
         emoji = reaction.emoji
-        if emoji == self.interface.fail_emoji:
+        interface.reaction_used(emoji)
+        if emoji == self.flow.fail_emoji:
             return SelectionResult(SelectionResultType.FAIL, 1)
-        if self is not self.interface.first and emoji == self.interface.back_emoji:
+        if not self.first and emoji == self.flow.back_emoji:
             return SelectionResult(SelectionResultType.BACK)
-        self.next = self.result_events.get(emoji, self.result_events.get('*', None))
-        return SelectionResult(SelectionResultType.SUCCESS, emoji)
+        return SelectionResult(SelectionResultType.SUCCESS, emoji, self.next_selection(emoji))
 
     def _check(self, reaction, user):
-        correct_reaction = False
-        for reaction_ in self.reactions:
-            if reaction_ != reaction.emoji:
-                continue
-            correct_reaction = True
-            break
-        return user is self.interface.member and (correct_reaction or reaction.emoji in self.interface_reactions)
-
-    async def _add_reactions(self):
-        for reaction in self.interface_reactions:
-            await self.interface.message.add_reaction(reaction)
-        for reaction in self.reactions:
-            await self.interface.message.add_reaction(reaction)
+        # The router only hands over reactions of the session member on the session message
+        return reaction.emoji in self.reactions or reaction.emoji in self.interface_reactions
 
 
 class ConfirmSelection(ReactionSelection):
 
-    def __init__(self, interface, head: str, desc: str, **kwargs):
-        super().__init__(interface, head, desc, reactions=[interface.success_emoji], **kwargs)
+    def __init__(self, flow, head: str, desc: str, **kwargs):
+        super().__init__(flow, head, desc, reactions=[flow.success_emoji], **kwargs)
 
 
 class MultiReactionSelection(ReactionSelection):
 
-    async def run(self):
-        reaction_task = self.interface.loop.create_task(self._add_reactions())
+    def validate(self):
+        SelectionBase.validate(self)
+        if not self.reactions:
+            raise SelectionBuildException(f'"{self.title}" has no reactions to select.')
+        if set(self.result_events) - {'*'}:
+            raise SelectionBuildException(f'"{self.title}" only supports the result "*".')
+
+    async def run(self, interface):
+        options = {str(option): option for option in self.reactions}
+        toggled = set()
+
+        def toggle(payload, added):
+            emoji = str(payload.emoji)
+            if emoji not in options:
+                return
+            if added:
+                toggled.add(emoji)
+            else:
+                toggled.discard(emoji)
+
+        # The toggles are tracked from raw reaction events, so confirming needs no request
+        unsubscribe = interface.subscribe_reactions(toggle)
+        interface.show_reactions(self.interface_reactions + self.reactions + [self.flow.success_emoji])
         try:
-            reaction, user = await self.interface.bot.wait_for('reaction_add', timeout=self.interface.timeout,
-                                                               check=self._check)
+            reaction, user = await interface.wait_for_reaction(self._check)
         except asyncio.TimeoutError:
-            reaction_task.cancel()
-            await self.interface.message.clear_reactions()
             return SelectionResult(SelectionResultType.FAIL, 0)
+        finally:
+            unsubscribe()
 
-        selections = []
-        for reaction in reaction.message.reactions:
-            if reaction.emoji not in self.reactions:
-                continue
-            users = await reaction.users().flatten()
-            for user in users:
-                if user is not self.interface.member:
-                    continue
-                selections.append(reaction.emoji)
-                break
-
-        reaction_task.cancel()
-        await self.interface.message.clear_reactions()
+        selections = [option for key, option in options.items() if key in toggled]
         emoji = reaction.emoji
-        if emoji is self.interface.fail_emoji:
+        interface.reaction_used(emoji, *selections)
+        if emoji == self.flow.fail_emoji:
             return SelectionResult(SelectionResultType.FAIL, 1)
-        if self is not self.interface.first and emoji is self.interface.back_emoji:
+        if not self.first and emoji == self.flow.back_emoji:
             return SelectionResult(SelectionResultType.BACK)
-        return SelectionResult(SelectionResultType.SUCCESS, selections)
+        return SelectionResult(SelectionResultType.SUCCESS, selections, self.next_selection('*'))
 
     def _check(self, reaction, user):
-        return user is self.interface.member and reaction.emoji in (self.interface_reactions +
-                                                                    [self.interface.success_emoji])
-
-    async def _add_reactions(self):
-        for reaction in self.interface_reactions:
-            await self.interface.message.add_reaction(reaction)
-        for reaction in self.reactions:
-            await self.interface.message.add_reaction(reaction)
-        await self.interface.message.add_reaction(self.interface.success_emoji)
+        return reaction.emoji in self.interface_reactions or reaction.emoji == self.flow.success_emoji
 
 
 class TextSelection(SelectionBase):
 
-    def __init__(self, interface, title, text, **kwargs):
-        super().__init__(interface, title, text, **kwargs)
+    def __init__(self, flow, title, text, **kwargs):
+        super().__init__(flow, title, text, **kwargs)
 
-        if not kwargs.get('first', False):
-            self.fields.append({'name': self.interface.back_hint, 'value': '\u200b' + str(self.interface.back_emoji)})
-        self.fields.append({'name': self.interface.cancel_hint, 'value': '\u200b' + str(self.interface.fail_emoji)})
+        if not self.first:
+            self.fields.append({'name': flow.back_hint, 'value': '\u200b' + str(flow.back_emoji)})
+        self.fields.append({'name': flow.cancel_hint, 'value': '\u200b' + str(flow.fail_emoji)})
 
-    async def run(self):
-        reaction_task = self.interface.loop.create_task(self._add_reactions())
+    async def run(self, interface):
+        interface.show_reactions(self.interface_reactions)
 
-        done, pending = await asyncio.wait([
-            self.interface.bot.wait_for('message', timeout=self.interface.timeout, check=self._check),
-            self.interface.bot.wait_for('reaction_add', timeout=self.interface.timeout, check=self._check_cancel)
-        ], return_when=asyncio.FIRST_COMPLETED)
-        for future in pending:
-            future.cancel()
         try:
-            result = done.pop().result()
+            result = await interface.wait_for_reaction_or_message(self._check_cancel, None)
         except asyncio.TimeoutError:
-            reaction_task.cancel()
-            await self.interface.message.clear_reactions()
             return SelectionResult(SelectionResultType.FAIL, 0)
 
-        reaction_task.cancel()
-        await self.interface.message.clear_reactions()
         if type(result) is tuple:
             reaction, member = result
             emoji = reaction.emoji
-            if emoji == self.interface.fail_emoji:
+            interface.reaction_used(emoji)
+            if emoji == self.flow.fail_emoji:
                 return SelectionResult(SelectionResultType.FAIL, 1)
-            if self is not self.interface.first and emoji == self.interface.back_emoji:
-                return SelectionResult(SelectionResultType.BACK)
-        self.next = self.result_events.get(result.content, self.result_events.get('*', None))
+            return SelectionResult(SelectionResultType.BACK)
         data = result.content
         await result.delete()
-        return SelectionResult(SelectionResultType.SUCCESS, data)
-
-    def _check(self, user_input):
-        return user_input.author is self.interface.member
+        return SelectionResult(SelectionResultType.SUCCESS, data, self.next_selection(data))
 
     def _check_cancel(self, reaction, user):
-        return user is self.interface.member and reaction.emoji in self.interface_reactions
-
-    async def _add_reactions(self):
-        for reaction in self.interface_reactions:
-            await self.interface.message.add_reaction(reaction)
+        return reaction.emoji in self.interface_reactions
 
 
 class SelectionSuccess(SelectionBase):
 
-    def __init__(self, interface, header, description, **kwargs):
-        super().__init__(interface, header, description, **kwargs)
+    def __init__(self, flow, header, description, **kwargs):
+        super().__init__(flow, header, description, **kwargs)
 
-        self.color = kwargs.get('color', self.interface.success_color)
+        self.color = kwargs.get('color', flow.success_color)
 
 
 class SelectionFail(SelectionBase):
 
-    def __init__(self, interface, head: str, desc: str, allow_retry=True, **kwargs):
-        super().__init__(interface, head, desc, **kwargs)
+    def __init__(self, flow, head: str, desc: str, allow_retry=True, **kwargs):
+        super().__init__(flow, head, desc, **kwargs)
 
         if allow_retry:
-            self.fields.append({'name': self.interface.retry_hint, 'value': '\u200b' + str(self.interface.retry_emoji)})
+            self.fields.append({'name': flow.retry_hint, 'value': '\u200b' + str(flow.retry_emoji)})
 
         self.allow_retry = allow_retry
-        self.color = kwargs.get('color', interface.fail_color)
+        self.color = kwargs.get('color', flow.fail_color)
 
-    async def run(self):
+    async def run(self, interface):
         if not self.allow_retry:
             return SelectionResult(SelectionResultType.NONE)
-        await self.interface.message.add_reaction(self.interface.retry_emoji)
+        interface.show_reactions([self.flow.retry_emoji])
         try:
-            await self.interface.bot.wait_for('reaction_add', timeout=self.interface.timeout, check=self._check)
+            await interface.wait_for_reaction(self._check)
         except asyncio.TimeoutError:
-            await self.interface.message.clear_reactions()
             return SelectionResult(SelectionResultType.NONE)
 
-        await self.interface.message.clear_reactions()
+        interface.reaction_used(self.flow.retry_emoji)
         return SelectionResult(SelectionResultType.RETRY)
 
     def _check(self, reaction, user):
-        return user is self.interface.member and reaction.emoji == self.interface.retry_emoji
+        return reaction.emoji == self.flow.retry_emoji
 
 
 class SelectionResult:
 
-    def __init__(self, type, value=None):
+    def __init__(self, type, value=None, next=None):
         self.type = type
         self.value = value
+        self.next = next
 
 
 class ReplacedText:
@@ -284,9 +264,90 @@ class ReplacedText:
         self.text = text
         self.replace_functions = replace_functions
 
+        self._last_replacements = None
+        self._last_text = None
+
     def get(self, result):
-        replacements = [func(result) for func in self.replace_functions]
-        return self.text.format(*replacements)
+        replacements = tuple(func(result) for func in self.replace_functions)
+        if replacements != self._last_replacements:
+            self._last_text = self.text.format(*replacements)
+            self._last_replacements = replacements
+        return self._last_text
+
+
+class SelectionTemplate:
+
+    def __init__(self, selection: SelectionBase):
+        self._slots = []  # (ReplacedText, setter(data, value))
+
+        msg = discord.Embed()
+        msg.colour = selection.color
+        msg.set_author(name=self._static(selection.title, self._set_author), url=selection.header_url,
+                       icon_url=selection.header_icon)
+        msg.description = self._static(selection.text, self._set_description)
+        for index, field in enumerate(selection.fields):
+            msg.add_field(name=self._static(field.get('name', 'None'), self._set_field(index, 'name')),
+                          value=self._static(field.get('value', 'None'), self._set_field(index, 'value')),
+                          inline=field.get('inline', True))
+        msg.set_footer(text=self._static(selection.footer, self._set_footer), icon_url=selection.footer_icon)
+
+        thumbnail_url = self._static(selection.thumbnail, self._set_url('thumbnail'))
+        if check_url(thumbnail_url):
+            msg.set_thumbnail(url=thumbnail_url)
+        image_url = self._static(selection.image, self._set_url('image'))
+        if check_url(image_url):
+            msg.set_image(url=image_url)
+
+        self._data = msg.to_dict()
+        self._embed = msg if not self._slots else None
+
+    def _static(self, value, setter):
+        if type(value) is not ReplacedText:
+            return value
+        self._slots.append((value, setter))
+        return discord.embeds.EmptyEmbed
+
+    @staticmethod
+    def _set_author(data, value):
+        data.setdefault('author', {})['name'] = value
+
+    @staticmethod
+    def _set_description(data, value):
+        data['description'] = value
+
+    @staticmethod
+    def _set_field(index, key):
+        def setter(data, value):
+            data['fields'][index][key] = value
+        return setter
+
+    @staticmethod
+    def _set_footer(data, value):
+        data.setdefault('footer', {})['text'] = value
+
+    @staticmethod
+    def _set_url(key):
+        def setter(data, value):
+            if check_url(value):
+                data[key] = {'url': value}
+        return setter
+
+    def render(self, interface):
+        if not self._slots:
+            return self._embed
+        # Templates are shared by all sessions of a flow, the last render is cached per session
+        version, values, embed = interface.render_cache.get(self, (None, None, None))
+        if version == interface.result_version:
+            return embed
+        result = interface.result()
+        new_values = tuple(text.get(result) for text, _ in self._slots)
+        if new_values != values:
+            data = copy.deepcopy(self._data)
+            for (_, setter), value in zip(self._slots, new_values):
+                setter(data, value)
+            embed = discord.Embed.from_dict(data)
+        interface.render_cache[self] = (interface.result_version, new_values, embed)
+        return embed
 
 
 class SelectionType(Enum):
@@ -306,16 +367,61 @@ class SelectionResultType(Enum):
     RETRY = 4
 
 
-class SelectionInterface:
-
-    def __init__(self, ctx, **kwargs):
-        self.ctx = ctx
-        self.bot = ctx.bot
-        self.member = ctx.author
-        self.guild = ctx.guild
-        self.channel = ctx.channel
-        self.loop = self.bot.loop
-
+class SelectionSessions:
+
+    def __init__(self, cfg):
+        self.cfg = cfg
+        self.max_user_sessions = None
+        self.max_guild_sessions = None
+        self._configure()
+        cfg.subscribe(self._configure, 'Selection.MaxUserSessions', 'Selection.MaxGuildSessions')
+        self._users = dict()  # user_id -> [SelectionInterface], oldest first
+        self._guilds = dict()  # guild_id -> [SelectionInterface]
+
+    @classmethod
+    def of(cls, bot):
+        sessions = getattr(bot, 'selection_sessions', None)
+        if sessions is None:
+            sessions = bot.selection_sessions = cls(bot.cfg)
+        return sessions
+
+    def _configure(self, changes=None):
+        # Lower limits apply to sessions opened afterwards
+        self.max_user_sessions = self.cfg.selection.max_user_sessions
+        self.max_guild_sessions = self.cfg.selection.max_guild_sessions
+
+    def __len__(self):
+        return sum(len(sessions) for sessions in self._users.values())
+
+    def open(self, interface):
+        member_id = interface.member.id
+        guild_sessions = self._guilds.get(interface.guild_id, [])
+        if interface.guild_id is not None and len(guild_sessions) >= self.max_guild_sessions:
+            # A full guild still lets a member replace their own session in it
+            own_session = next((session for session in guild_sessions if session.member.id == member_id), None)
+            if own_session is None:
+                return False
+            self.close(own_session)
+        # A member opening another menu most likely abandoned the oldest one
+        while len(self._users.get(member_id, ())) >= self.max_user_sessions:
+            self.close(self._users[member_id][0])
+        self._users.setdefault(member_id, list()).append(interface)
+        self._guilds.setdefault(interface.guild_id, list()).append(interface)
+        return True
+
+    def close(self, interface):
+        interface.close()
+        for sessions, key in ((self._users, interface.member.id), (self._guilds, interface.guild_id)):
+            active = sessions.get(key)
+            if active and interface in active:
+                active.remove(interface)
+                if not active:
+                    del sessions[key]
+
+
+class SelectionFlow:
+
+    def __init__(self, **kwargs):
         self.timeout = kwargs.get('timeout', 120)
 
         self.success_emoji = kwargs.get('success_emoji', '\U00002705')  # :white_check_mark:
@@ -332,87 +438,290 @@ class SelectionInterface:
 
         self.abort_title = kwargs.get('abort_title', 'Selection Canceled')
         self.abort_text = kwargs.get('abort_text', 'The selection has been successfully canceled!')
+        self.limit_title = kwargs.get('limit_title', 'Selection Unavailable')
+        self.limit_text = kwargs.get('limit_text', 'There are too many open selections on this server right now. '
+                                                   'Please try again later!')
         self.timeout_title = kwargs.get('timeout_title', 'Selection Canceled')
         self.timeout_text = kwargs.get('timeout_text', 'The selection has been canceled after {0:.1f} minutes!')\
             .format(self.timeout / 60)
 
+        self.load_color = kwargs.get('load_color', discord.Color.gold())
+        self.load_text = kwargs.get('load_text', '**Loading...**')
+
         self.cancel_hint = kwargs.get('cancel_hint', '**Cancel**')
         self.retry_hint = kwargs.get('retry_hint', '**Retry**')
         self.back_hint = kwargs.get('back_hint', '**Back**')
 
-        self.message = None
+        self.reaction_concurrency = kwargs.get('reaction_concurrency', 4)
+
         self.first = None
-        self.current_selection = None
-        self._result = {}
+        self.frozen = False
+        self._load_embed = None
 
-    def check_url(self, url):
-        regex = re.compile(
-            r'^(?:http|ftp)s?://'  # http:// or https://
-            r'(?:(?:[A-Z0-9](?:[A-Z0-9-]{0,61}[A-Z0-9])?\.)+(?:[A-Z]{2,6}\.?|[A-Z0-9-]{2,}\.?)|'  # domain...
-            r'localhost|'  # localhost...
-            r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})'  # ...or ip
-            r'(?::\d+)?'  # optional port
-            r'(?:/?|[/?]\S+)$', re.IGNORECASE)
+        self.timeout_selection = SelectionFail(self, self.timeout_title, self.timeout_text)
+        self.abort_selection = SelectionFail(self, self.abort_title, self.abort_text, False)
+        self.limit_selection = SelectionFail(self, self.limit_title, self.limit_text, False)
 
-        return re.match(regex, url) is not None
+    def check_mutable(self):
+        if self.frozen:
+            raise SelectionBuildException('The selection flow is frozen and can not be changed anymore.')
 
     def set_base_selection(self, selection, header: str, desc: str, **kwargs):
+        self.check_mutable()
         kwargs['first'] = True
-        base_selection = selection.value(self, header, desc, **kwargs)
-        self.first = base_selection
-        self.current_selection = base_selection
-        return self.current_selection
+        self.first = selection.value(self, header, desc, **kwargs)
+        return self.first
+
+    def selections(self):
+        selections = [self.first, self.timeout_selection, self.abort_selection, self.limit_selection]
+        seen = set(selections)
+        for selection in selections:
+            for next_selection in selection.result_events.values():
+                if next_selection not in seen:
+                    seen.add(next_selection)
+                    selections.append(next_selection)
+        return selections
+
+    def freeze(self):
+        if self.frozen:
+            return self
+        if self.first is None:
+            raise SelectionBuildException('The selection flow has no base selection.')
+        for selection in self.selections():
+            selection.validate()
+            selection.compile()
+        self.frozen = True
+        return self
+
+    async def start(self, ctx):
+        interface = SelectionInterface(ctx, self.freeze())
+        await interface.start()
+        return interface
+
+    @property
+    def load_embed(self):
+        if self._load_embed is None:
+            self._load_embed = discord.Embed()
+            self._load_embed.colour = self.load_color
+            self._load_embed.description = self.load_text
+        return self._load_embed
+
+
+class SelectionInterface:
+
+    def __init__(self, ctx, flow: SelectionFlow = None, **kwargs):
+        self.ctx = ctx
+        self.bot = ctx.bot
+        self.member = ctx.author
+        self.guild = ctx.guild
+        self.guild_id = ctx.guild.id if ctx.guild else None
+        self.channel = ctx.channel
+        self.loop = self.bot.loop
+        self.router = SelectionRouter.of(self.bot)
+        self.sessions = SelectionSessions.of(self.bot)
+        self.editor = MessageEditor.of(self.bot)
 
-    async def start(self, retry=False):
-        base_selection_msg = self.current_selection.build_message()
-        if not retry:
-            self.message = await self.channel.send(embed=base_selection_msg)
+        # The flow is the shared, immutable graph, the interface only holds the state of one session
+        self.flow = flow or SelectionFlow(**kwargs)
+
+        self.message = None
+        self.current_selection = self.flow.first
+        self.closed = False
+        self.message_deleted = False
+        self._step = None
+        self._history = []
+        self._result = {}
+        self.result_version = 0
+        self.render_cache = {}  # SelectionTemplate -> (result_version, values, embed)
+
+        self._reactions = []  # reactions of the bot on the message, in order
+        self._user_reactions = set()  # reactions of the member which have to be removed before reuse
+        self._reaction_sync = None
+        self._reaction_tasks = []
+        self._reaction_requests = set()
+        self._reaction_limiter = asyncio.Semaphore(self.flow.reaction_concurrency)
+
+    @property
+    def first(self):
+        return self.flow.first
+
+    @staticmethod
+    def check_url(url):
+        return check_url(url)
+
+    def show_reactions(self, reactions):
+        previous = self._reaction_sync
+        self._reaction_sync = self.loop.create_task(self._sync_reactions(list(reactions), previous))
+        return self._reaction_sync
+
+    def reaction_used(self, *emojis):
+        self._user_reactions.update(emojis)
+
+    async def _sync_reactions(self, reactions, previous):
+        if previous:
+            await asyncio.gather(previous, return_exceptions=True)
+        for task in self._reaction_tasks:
+            task.cancel()
+        self._reaction_tasks = []
+        if self._reaction_requests:
+            await asyncio.gather(*self._reaction_requests, return_exceptions=True)
+
+        # New reactions are appended, so only a prefix of the wanted reactions can stay on the message
+        keep = []
+        position = 0
+        for emoji in reactions:
+            if emoji not in self._reactions[position:]:
+                break
+            position = self._reactions.index(emoji, position) + 1
+            keep.append(emoji)
+        remove = [emoji for emoji in self._reactions if emoji not in keep]
+
+        if remove and not keep:
+            await self.message.clear_reactions()
         else:
-            await self.message.edit(embed=base_selection_msg)
-        result = await self.current_selection.run()
-        if result.type is SelectionResultType.SUCCESS:
-            self._result[0] = result.value
-            await self.current_selection.run_action()
-        elif result.type is SelectionResultType.FAIL:
-            if result.value == 0:
-                self.current_selection.next = SelectionFail(self, self.timeout_title, self.timeout_text)
-            elif result.value == 1:
-                self.current_selection.next = SelectionFail(self, self.abort_title, self.abort_text, False)
-
-        next_selection = self.current_selection.next
-        if next_selection:
-            next_selection.prev = self.current_selection
-        self.current_selection = next_selection
-
-        index = 1
-        while self.current_selection:
-            selection_msg = self.current_selection.build_message()
-            await self.message.edit(embed=selection_msg)
-            try:
-                result = await self.current_selection.run()
+            await asyncio.gather(*[self._clear_reaction(emoji) for emoji in remove],
+                                 *[self._remove_user_reaction(emoji) for emoji in keep
+                                   if emoji in self._user_reactions])
+        self._user_reactions.clear()
+
+        self._reactions = keep
+        for emoji in reactions[len(keep):]:
+            self._reactions.append(emoji)
+            self._reaction_tasks.append(self.loop.create_task(self._add_reaction(emoji)))
+
+    async def _clear_reaction(self, emoji):
+        try:
+            await self.message.clear_reaction(emoji)
+        except discord.NotFound:
+            pass
+
+    async def _remove_user_reaction(self, emoji):
+        try:
+            await self.message.remove_reaction(emoji, self.member)
+        except discord.NotFound:
+            pass
+
+    async def _add_reaction(self, emoji):
+        try:
+            await self._reaction_limiter.acquire()
+        except asyncio.CancelledError:
+            self._reactions.remove(emoji)
+            raise
+        # Requests already sent are not cancelled, so the tracked reactions stay accurate
+        request = self.loop.create_task(self.message.add_reaction(emoji))
+        self._reaction_requests.add(request)
+        request.add_done_callback(lambda task: self._add_reaction_done(task, emoji))
+        try:
+            await asyncio.shield(request)
+        except discord.HTTPException:
+            pass
+
+    def _add_reaction_done(self, request, emoji):
+        self._reaction_limiter.release()
+        self._reaction_requests.discard(request)
+        if (request.cancelled() or request.exception()) and emoji in self._reactions:
+            self._reactions.remove(emoji)
+
+    def subscribe_reactions(self, callback):
+        return self.router.subscribe(self.router.reaction_key(self.message, self.member), callback)
+
+    async def wait_for_reaction(self, check):
+        key = self.router.reaction_key(self.message, self.member)
+        return await self.router.wait_for(self.flow.timeout, reaction_add=(key, check))
+
+    async def wait_for_reaction_or_message(self, reaction_check, message_check):
+        return await self.router.wait_for(
+            self.flow.timeout,
+            reaction_add=(self.router.reaction_key(self.message, self.member), reaction_check),
+            message=(self.router.message_key(self.channel, self.member), message_check)
+        )
+
+    def set_base_selection(self, selection, header: str, desc: str, **kwargs):
+        self.current_selection = self.flow.set_base_selection(selection, header, desc, **kwargs)
+        return self.current_selection
+
+    async def start(self):
+        if not self.sessions.open(self):
+            self.message = await self.channel.send(embed=self.flow.limit_selection.build_message(self))
+            return
+        unsubscribe = None
+        try:
+            self.message = await self.channel.send(embed=self.current_selection.build_message(self))
+            unsubscribe = self.router.subscribe_delete(self.message, self._on_message_delete)
+            while self.current_selection and not self.closed:
+                result = await self._run_step()
                 if result.type is SelectionResultType.SUCCESS:
-                    self._result[index] = result.value
-                    await self.current_selection.run_action()
-                    index += 1
-                elif result.type is SelectionResultType.BACK:
-                    index -= 1
-                    self.current_selection = self.current_selection.prev
-                    continue
-                elif result.type is SelectionResultType.FAIL:
-                    if result.value == 0:
-                        self.current_selection.next = SelectionFail(self, self.timeout_title, self.timeout_text)
-                    elif result.value == 1:
-                        self.current_selection.next = SelectionFail(self, self.abort_title, self.abort_text, False)
-                elif result.type is SelectionResultType.RETRY:
-                    self.current_selection = self.first
-                    self._result = {}
-                    return await self.start(retry=True)
-            except AttributeError:
-                pass
-            next_selection = self.current_selection.next
-            if next_selection:
-                next_selection.prev = self.current_selection
-            self.current_selection = next_selection
+                    self._set_result(len(self._history), result.value)
+                    await self.current_selection.run_action(self)
+                self.current_selection = self._transition(result)
+                if self.current_selection and not self.closed:
+                    self.edit(self.current_selection.build_message(self))
+        finally:
+            if unsubscribe:
+                unsubscribe()
+            evicted = self.closed
+            self.sessions.close(self)
+            self._release()
+
+        if self.message_deleted:
+            return
+        if evicted:
+            self.edit(self.flow.abort_selection.build_message(self))
+        await self.show_reactions([])
+
+    def _transition(self, result):
+        # The history only holds the steps which can be returned to, a retry resets the session in place
+        if result.type is SelectionResultType.SUCCESS:
+            self._history.append(self.current_selection)
+            return result.next
+        if result.type is SelectionResultType.BACK:
+            return self._history.pop()
+        if result.type is SelectionResultType.FAIL:
+            return self.flow.timeout_selection if result.value == 0 else self.flow.abort_selection
+        if result.type is SelectionResultType.RETRY:
+            self._history = []
+            self._result = {}
+            self.result_version += 1
+            return self.flow.first
+        return None
+
+    async def _run_step(self):
+        self._step = self.loop.create_task(self.current_selection.run(self))
+        try:
+            return await self._step
+        except asyncio.CancelledError:
+            if not self.closed:
+                raise
+            return SelectionResult(SelectionResultType.NONE)
+        finally:
+            self._step = None
+
+    def edit(self, embed):
+        # Edits are queued per message, quick navigation only sends the latest embed
+        return self.editor.edit(self.message, embed=embed)
+
+    def close(self):
+        self.closed = True
+        if self._step is not None:
+            self._step.cancel()
+
+    def _on_message_delete(self):
+        self.message_deleted = True
+        self.editor.discard(self.message)
+        self.close()
+
+    def _release(self):
+        self.current_selection = None
+        self._history = []
+        self.render_cache.clear()
 
     def result(self):
         return self._result
+
+    def _set_result(self, index, value):
+        self._result[index] = value
+        self.result_version += 1
+
+    @property
+    def load_embed(self):
+        return self.flow.load_embed
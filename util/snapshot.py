@@ -0,0 +1,183 @@
+import asyncio
+import datetime
+import gzip
+import json
+import os
+
+import bson
+from bson import json_util
+from pymongo import ReplaceOne
+
+
+class Snapshot:
+
+    default_collections = ('GuildData', 'Storage', 'Stats', 'DailyStats')
+    formats = ('ndjson', 'bson')
+
+    def __init__(self, database, directory='backups', batch_size=1000, concurrency=4):
+        self._database = database
+        self.directory = directory
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+
+    @property
+    def _manifest_path(self):
+        return os.path.join(self.directory, 'manifest.json')
+
+    def manifest(self):
+        if not os.path.isfile(self._manifest_path):
+            return []
+        with open(self._manifest_path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def _write_manifest(self, manifest):
+        temp_path = f'{self._manifest_path}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(temp_path, self._manifest_path)
+
+    async def create(self, collections=None, incremental=False, file_format='ndjson'):
+        if file_format not in self.formats:
+            raise ValueError(f'Unknown snapshot format {file_format}.')
+        loop = asyncio.get_event_loop()
+        manifest = await loop.run_in_executor(None, self.manifest)
+        collections = collections or self.default_collections
+
+        # Taken from the server, whose clock wrote the timestamps the next incremental snapshot compares with
+        created = await self._database.server_time()
+        since = datetime.datetime.fromisoformat(manifest[-1]['created']) if incremental and manifest else None
+        name = created.strftime('%Y-%m-%d-%H%M%S-%f')
+        path = os.path.join(self.directory, name)
+        await loop.run_in_executor(None, lambda: os.makedirs(path, exist_ok=True))
+
+        entry = {
+            'name': name,
+            'created': created.isoformat(),
+            'since': since.isoformat() if since else None,
+            'format': file_format,
+            'collections': dict()
+        }
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def dump(collection):
+            async with semaphore:
+                entry['collections'][collection] = await self._dump_collection(path, collection, since, file_format)
+
+        await asyncio.gather(*[dump(collection) for collection in collections])
+
+        manifest.append(entry)
+        await loop.run_in_executor(None, self._write_manifest, manifest)
+        counts = ', '.join(f'{collection}: {info["count"]}' for collection, info in entry['collections'].items())
+        self._database._bot.logger.info(f'[DATABASE] Snapshot {name} created ({counts}).')
+        return name
+
+    async def _dump_collection(self, path, collection, since, file_format):
+        loop = asyncio.get_event_loop()
+        filename = f'{collection}.{file_format}.gz'
+        db_filter = {self._database.timestamp_field: {'$gt': since}} if since else {}
+        cursor = self._database.get_collection(collection).find(db_filter).batch_size(self.batch_size)
+
+        file = await loop.run_in_executor(None, gzip.open, os.path.join(path, filename), 'wb')
+        count = 0
+        try:
+            chunk = list()
+            async for document in cursor:
+                chunk.append(self._encode(document, file_format))
+                count += 1
+                if len(chunk) >= self.batch_size:
+                    await loop.run_in_executor(None, file.write, b''.join(chunk))
+                    chunk = list()
+            if chunk:
+                await loop.run_in_executor(None, file.write, b''.join(chunk))
+        finally:
+            await loop.run_in_executor(None, file.close)
+        return {
+            'file': filename,
+            'count': count
+        }
+
+    @staticmethod
+    def _encode(document, file_format):
+        if file_format == 'bson':
+            return bson.encode(document)
+        return json_util.dumps(document, json_options=json_util.CANONICAL_JSON_OPTIONS).encode('utf-8') + b'\n'
+
+    async def restore(self, name=None, collections=None):
+        loop = asyncio.get_event_loop()
+        manifest = await loop.run_in_executor(None, self.manifest)
+        chain = self._restore_chain(manifest, name)
+        collections = collections or self.default_collections
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def restore_collection(collection):
+            async with semaphore:
+                count = 0
+                # Incremental snapshots are replayed on top of their base in order
+                for entry in chain:
+                    info = entry['collections'].get(collection)
+                    if info is None:
+                        continue
+                    file_path = os.path.join(self.directory, entry['name'], info['file'])
+                    count += await self._load_collection(file_path, collection, entry.get('format', 'ndjson'))
+                return collection, count
+
+        results = await asyncio.gather(*[restore_collection(collection) for collection in collections])
+        await self._database.ensure_indexes()
+        counts = ', '.join(f'{collection}: {count}' for collection, count in results)
+        self._database._bot.logger.info(f'[DATABASE] Snapshot {chain[-1]["name"]} restored ({counts}).')
+        return dict(results)
+
+    @staticmethod
+    def _restore_chain(manifest, name):
+        if not manifest:
+            raise FileNotFoundError('No snapshots available.')
+        end = len(manifest) - 1
+        if name is not None:
+            names = [entry['name'] for entry in manifest]
+            if name not in names:
+                raise FileNotFoundError(f'Snapshot {name} does not exist.')
+            end = names.index(name)
+        start = end
+        while manifest[start]['since'] is not None and start > 0:
+            start -= 1
+        return manifest[start:end + 1]
+
+    async def _load_collection(self, file_path, collection, file_format):
+        loop = asyncio.get_event_loop()
+        target = self._database.get_collection(collection)
+        key = self._database.unique_key(collection)
+        documents = self._read_documents(file_path, file_format)
+        count = 0
+        while True:
+            batch = await loop.run_in_executor(None, self._read_batch, documents)
+            if not batch:
+                break
+            await target.bulk_write([self._restore_operation(document, key) for document in batch], ordered=False)
+            count += len(batch)
+        return count
+
+    @staticmethod
+    def _restore_operation(document, key):
+        if key is None or key not in document:
+            return ReplaceOne({'_id': document['_id']}, document, upsert=True)
+        # Match on the natural key so documents the bot already seeded are replaced instead of duplicated
+        replacement = {field: value for field, value in document.items() if field != '_id'}
+        return ReplaceOne({key: document[key]}, replacement, upsert=True)
+
+    @staticmethod
+    def _read_documents(file_path, file_format):
+        with gzip.open(file_path, 'rb') as file:
+            if file_format == 'bson':
+                yield from bson.decode_file_iter(file)
+                return
+            for line in file:
+                if line.strip():
+                    yield json_util.loads(line)
+
+    def _read_batch(self, documents):
+        batch = list()
+        for document in documents:
+            batch.append(document)
+            if len(batch) >= self.batch_size:
+                break
+        return batch
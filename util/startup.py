@@ -0,0 +1,98 @@
+import ast
+import contextlib
+import importlib
+import importlib.util
+import os
+import time
+
+
+def process_started():
+    # perf_counter value at the process start, so the interpreter startup is part of the first phase
+    try:
+        with open('/proc/self/stat', encoding='utf-8') as file:
+            start_ticks = int(file.read().rsplit(')', 1)[1].split()[19])
+        with open('/proc/uptime', encoding='utf-8') as file:
+            uptime = float(file.read().split()[0])
+        age = uptime - start_ticks / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError, AttributeError):
+        # Only available on Linux
+        return None
+    return time.perf_counter() - age
+
+
+def preload_module(name):
+    # Meant to run in an executor, imports everything the module imports at the top without running it
+    spec = importlib.util.find_spec(name)
+    if spec is None or spec.loader is None:
+        return
+    spec.loader.get_code(name)  # compiles and caches the bytecode
+    tree = ast.parse(spec.loader.get_source(name) or '')
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            modules = [node.module]
+        else:
+            continue
+        for module in modules:
+            try:
+                importlib.import_module(module)
+            except Exception:
+                # Reported by the actual load
+                pass
+
+
+class StartupProfiler:
+
+    def __init__(self, started=None):
+        self.started = started or time.perf_counter()
+        self.phases = list()  # (name, offset from the start, seconds)
+        self.finished = None
+        self._running = dict()  # name -> perf counter at its start
+
+    def start(self, name):
+        self._running[name] = time.perf_counter()
+
+    def stop(self, name):
+        # Returns None if the phase was not running, e.g. on_ready after a reconnect
+        start = self._running.pop(name, None)
+        if start is None:
+            return None
+        return self.record(name, start)
+
+    def record(self, name, start, end=None):
+        end = end or time.perf_counter()
+        self.phases.append((name, start - self.started, end - start))
+        return end - start
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        self.start(name)
+        try:
+            yield
+        finally:
+            self.stop(name)
+
+    async def measure(self, name, coroutine):
+        with self.phase(name):
+            return await coroutine
+
+    def finish(self, metrics=None):
+        self.finished = time.perf_counter() - self.started
+        if metrics is not None:
+            metrics.gauge('startup_seconds', 'Time from the process start until the bot was ready').set(self.finished)
+            for name, _, seconds in self.phases:
+                metrics.gauge('startup_phase_seconds', 'Time spent in each startup phase', phase=name).set(seconds)
+        return self.finished
+
+    def report(self, width=40):
+        total = self.finished or time.perf_counter() - self.started
+        name_width = max((len(name) for name, _, _ in self.phases), default=0)
+        lines = [f'[STARTUP] The bot was started successfully after {total:.2f} seconds:']
+        # The bars are a timeline, phases running concurrently overlap
+        for name, offset, seconds in sorted(self.phases, key=lambda phase: phase[1]):
+            position = min(width - 1, int(offset / total * width)) if total else 0
+            length = max(1, min(width - position, round(seconds / total * width))) if total else 1
+            bar = ' ' * position + '#' * length
+            lines.append(f'[STARTUP]   {name:<{name_width}} +{offset:7.3f}s {seconds:7.3f}s |{bar:<{width}}|')
+        return '\n'.join(lines)
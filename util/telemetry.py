@@ -0,0 +1,99 @@
+import random
+import time
+
+from util.cache import LRUCache
+
+
+class RateTracker:
+
+    def __init__(self, window=60.0, max_keys=10000):
+        self.window = window
+        self._windows = LRUCache(max_size=max_keys)  # key -> [window start, count, count of the previous window]
+
+    def hit(self, key):
+        now = time.monotonic()
+        start = now - now % self.window
+        entry = self._windows.get(key)
+        if entry is None:
+            entry = [start, 0, 0]
+            self._windows.set(key, entry)
+        elif entry[0] != start:
+            entry[2] = entry[1] if start - entry[0] == self.window else 0
+            entry[0] = start
+            entry[1] = 0
+        entry[1] += 1
+        return self._rate(entry, now)
+
+    def _rate(self, entry, now):
+        # Sliding window estimate, the previous window is weighted by how much of it still overlaps
+        start, count, previous = entry
+        elapsed = now - start
+        if elapsed >= 2 * self.window:
+            return 0.0
+        if elapsed >= self.window:
+            return count * (1 - (elapsed - self.window) / self.window)
+        return previous * (1 - elapsed / self.window) + count
+
+    def rate(self, key):
+        entry = self._windows.get(key)
+        return self._rate(entry, time.monotonic()) if entry else 0.0
+
+    def top(self, amount):
+        now = time.monotonic()
+        rates = [(key, self._rate(entry, now)) for key, entry in
+                 ((key, self._windows.get(key)) for key in self._windows.keys()) if entry]
+        return sorted((item for item in rates if item[1] > 0), key=lambda item: item[1], reverse=True)[:amount]
+
+
+class CommandTelemetry:
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.users = RateTracker()
+        self.guilds = RateTracker()
+
+        bot.add_listener(self._on_command_completion, 'on_command_completion')
+        bot.add_listener(self._on_command_error, 'on_command_error')
+        bot.metrics.add_collector(self._collect)
+
+    async def _on_command_completion(self, ctx):
+        self.record(ctx, 'ok')
+
+    async def _on_command_error(self, ctx, error):
+        self.record(ctx, 'error', getattr(error, 'original', error))
+
+    def record(self, ctx, status, error=None):
+        if ctx.command is None:
+            return
+        name = ctx.command.qualified_name
+        seconds = time.perf_counter() - ctx.created_at
+        guild_id = ctx.guild.id if ctx.guild else None
+
+        metrics = self.bot.metrics
+        metrics.histogram('command_seconds', 'Time from receiving a command until it finished',
+                          command=name).observe(seconds)
+        metrics.counter('commands_total', 'Finished commands', command=name, status=status).inc()
+        if error is not None:
+            metrics.counter('command_errors_total', 'Failed commands by error', command=name,
+                            error=type(error).__name__).inc()
+
+        user_rate = self.users.hit(ctx.author.id)
+        if guild_id:
+            self.guilds.hit(guild_id)
+
+        config = self.bot.cfg.telemetry
+        if config.user_rate_warning and user_rate - 1 < config.user_rate_warning <= user_rate:
+            self.bot.logger.warning(f'[TELEMETRY] {ctx.author} ({ctx.author.id}) runs more than '
+                                    f'{config.user_rate_warning} commands per minute!')
+        # Errors and slow commands are always logged, everything else is sampled
+        if status != 'ok' or seconds >= config.slow_command_threshold or random.random() < config.log_sample_rate:
+            self.bot.logger.info(f'[COMMAND] command={name} status={status} seconds={seconds:.3f} guild={guild_id} '
+                                 f'user={ctx.author.id} content={ctx.message.content!r}')
+
+    def _collect(self):
+        metrics = self.bot.metrics
+        metrics.remove('command_caller_rate')
+        for scope, tracker in (('user', self.users), ('guild', self.guilds)):
+            for key, rate in tracker.top(self.bot.cfg.telemetry.top_callers):
+                metrics.gauge('command_caller_rate', 'Commands per minute of the most active callers',
+                              scope=scope, id=key).set(rate)
@@ -6,16 +6,23 @@ import aiohttp
 import discord
 from discord.ext import commands
 
+from util.reporter import ExceptionReporter
+
 
 class Utils:
 
     def __init__(self, bot):
         self.bot = bot
 
-        self.channel = Channel(bot)
-        self.role = Role(bot)
+        self.resolver = Resolver(bot)
+        self.channel = Channel(bot, self.resolver)
+        self.role = Role(bot, self.resolver)
         self.color = Color()
         self.icon = Icon(bot)
+        self.reporter = ExceptionReporter(bot)
+
+    async def report_exception(self, text: str):
+        self.reporter.report(text)
 
     @staticmethod
     async def loading(ctx: commands.Context, text: str, edit: discord.Message = None):
@@ -69,23 +76,104 @@ class Utils:
             yield {k: data[k] for k in islice(it, size)}
 
 
-class Channel:
+class Resolver:
 
     def __init__(self, bot):
         self.bot = bot
+        self._entities = dict()  # (guild_id, config path) -> channel or role
+        self._keys = dict()  # entity id -> {(guild_id, config path)}
+
+        bot.add_listener(self._on_entity_update, 'on_guild_channel_update')
+        bot.add_listener(self._on_entity_delete, 'on_guild_channel_delete')
+        bot.add_listener(self._on_entity_update, 'on_guild_role_update')
+        bot.add_listener(self._on_entity_delete, 'on_guild_role_delete')
+        bot.add_listener(self._on_guild_remove, 'on_guild_remove')
+        bot.cfg.subscribe(self._on_config_change, 'Channel.News', 'Channel.Errors', 'Role.Notification')
+
+    async def channel(self, path, guild=None):
+        key = (guild.id if guild else None, path.lower())
+        channel = self._entities.get(key)
+        if channel is not None:
+            return channel
+        channel_id = self.bot.cfg.get(path)
+        if channel_id is None:
+            return None
+        channel = guild.get_channel(channel_id) if guild else self.bot.get_channel(channel_id)
+        if channel is None:
+            try:
+                channel = await self.bot.fetch_channel(channel_id)
+            except (discord.NotFound, discord.Forbidden):
+                return None
+            if guild and getattr(channel, 'guild', None) != guild:
+                return None
+        return self._store(key, channel)
+
+    async def role(self, path, guild=None):
+        key = (guild.id if guild else None, path.lower())
+        role = self._entities.get(key)
+        if role is not None:
+            return role
+        role_id = self.bot.cfg.get(path)
+        if role_id is None:
+            return None
+        # Role ids are unique, without a guild the role is looked up in every guild of the bot
+        guilds = [guild] if guild else self.bot.guilds
+        role = next((role for role in (guild.get_role(role_id) for guild in guilds) if role is not None), None)
+        if role is None and guild is not None:
+            role = discord.utils.get(await guild.fetch_roles(), id=role_id)
+        if role is None:
+            return None
+        return self._store(key, role)
+
+    def _store(self, key, entity):
+        self._entities[key] = entity
+        self._keys.setdefault(entity.id, set()).add(key)
+        return entity
+
+    def invalidate(self, entity_id):
+        for key in self._keys.pop(entity_id, set()):
+            self._entities.pop(key, None)
+
+    def clear(self):
+        self._entities.clear()
+        self._keys.clear()
 
-    def news(self):
-        channel_id = int(self.bot.cfg.get('Channel.News'))
-        return self.bot.get_channel(channel_id)
+    async def _on_entity_update(self, before, after):
+        if before.id in self._keys:
+            for key in self._keys[before.id]:
+                self._entities[key] = after
+
+    async def _on_entity_delete(self, entity):
+        self.invalidate(entity.id)
+
+    async def _on_guild_remove(self, guild):
+        for entity in [entity for entity in self._entities.values() if entity.guild.id == guild.id]:
+            self.invalidate(entity.id)
+
+    def _on_config_change(self, changes):
+        self.clear()
+
+
+class Channel:
+
+    def __init__(self, bot, resolver):
+        self.bot = bot
+        self._resolver = resolver
+
+    async def news(self, guild=None):
+        return await self._resolver.channel('Channel.News', guild)
+
+    async def errors(self, guild=None):
+        return await self._resolver.channel('Channel.Errors', guild)
 
 
 class Role:
-    def __init__(self, bot):
+    def __init__(self, bot, resolver):
         self.bot = bot
+        self._resolver = resolver
 
-    def notification(self):
-        role_id = int(self.bot.cfg.get('Role.Notification'))
-        return self.bot.guilds[0].get_role(role_id)
+    async def notification(self, guild=None):
+        return await self._resolver.role('Role.Notification', guild)
 
 
 class Icon:
@@ -0,0 +1,126 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+
+
+class Offender:
+
+    __slots__ = ('coroutine', 'location', 'stack', 'count', 'total', 'max', 'last_seen')
+
+    def __init__(self, coroutine, location, stack):
+        self.coroutine = coroutine
+        self.location = location
+        self.stack = stack
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last_seen = None
+
+    def record(self, lag, stack):
+        self.stack = stack
+        self.count += 1
+        self.total += lag
+        self.max = max(self.max, lag)
+        self.last_seen = time.time()
+
+
+class LoopWatchdog:
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.offenders = dict()  # (coroutine, location) -> Offender
+        self._loop_thread = None
+        self._heartbeat = time.monotonic()
+        self._sample = None  # stack of the loop thread taken during the current stall
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+        self._lag = bot.metrics.histogram('event_loop_lag_seconds', 'Delay of the event loop heartbeat')
+        self._stalls = bot.metrics.counter('event_loop_stalls_total', 'Heartbeats delayed past the threshold')
+        bot.metrics.add_collector(self._collect)
+
+    @property
+    def config(self):
+        return self.bot.cfg.watchdog
+
+    async def run(self):
+        if not self.config.enabled:
+            return
+        self._loop_thread = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._thread = threading.Thread(target=self._watch, name='loop-watchdog', daemon=True)
+        self._thread.start()
+
+        while not self._stopped.is_set():
+            expected = time.monotonic() + self.config.interval
+            await asyncio.sleep(self.config.interval)
+            lag = max(0.0, time.monotonic() - expected)
+            with self._lock:
+                self._heartbeat = time.monotonic()
+                stack, self._sample = self._sample, None
+            self._lag.observe(lag)
+            if lag >= self.config.threshold:
+                self._stalls.inc()
+                if stack:
+                    self._record(lag, stack)
+
+    def stop(self):
+        self._stopped.set()
+
+    def _watch(self):
+        # Runs on its own thread, so it still gets scheduled while the loop thread is blocked
+        while not self._stopped.wait(self.config.interval / 2):
+            with self._lock:
+                stalled = time.monotonic() - self._heartbeat > self.config.interval + self.config.threshold
+                if not stalled or self._sample is not None:
+                    continue
+                frame = sys._current_frames().get(self._loop_thread)
+                if frame is not None:
+                    self._sample = self._stack(frame)
+                del frame
+
+    @staticmethod
+    def _stack(frame, limit=64):
+        # The whole stack is walked, the outermost frame names the coroutine even in deep stacks
+        stack = traceback.extract_stack(frame)
+        # Frames up to the handle the loop is running belong to asyncio itself
+        for index in range(len(stack) - 1, -1, -1):
+            if stack[index].name == '_run' and stack[index].filename.endswith(os.path.join('asyncio', 'events.py')):
+                stack = stack[index + 1:] or stack
+                break
+        # Only the outermost frame and the innermost ones are kept
+        return stack if len(stack) <= limit else stack[:1] + stack[-(limit - 1):]
+
+    @staticmethod
+    def _path(filename):
+        try:
+            return os.path.relpath(filename)
+        except ValueError:
+            # On Windows there is no relative path to another drive
+            return filename
+
+    def _record(self, lag, stack):
+        outer, inner = stack[0], stack[-1]
+        coroutine = f'{self._path(outer.filename)}:{outer.name}'
+        location = f'{self._path(inner.filename)}:{inner.lineno} in {inner.name}'
+        offender = self.offenders.get((coroutine, location))
+        if offender is None:
+            if len(self.offenders) >= self.config.max_offenders:
+                del self.offenders[min(self.offenders, key=lambda key: self.offenders[key].total)]
+            offender = self.offenders[(coroutine, location)] = Offender(coroutine, location, stack)
+        offender.record(lag, stack)
+        self.bot.logger.warning(f'[WATCHDOG] The event loop was blocked for {lag:.3f}s by {coroutine} at {location}')
+
+    def report(self, amount=10):
+        return sorted(self.offenders.values(), key=lambda offender: offender.total, reverse=True)[:amount]
+
+    def _collect(self):
+        metrics = self.bot.metrics
+        metrics.remove('event_loop_blocked_seconds')
+        for offender in self.report(self.config.max_offenders):
+            metrics.gauge('event_loop_blocked_seconds', 'Time the event loop was blocked per offender',
+                          coroutine=offender.coroutine, location=offender.location).set(offender.total)